@@ -50,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -142,8 +143,96 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS':'drf_spectacular.openapi.AutoSchema',
+    # Same output as rest_framework.renderers.JSONRenderer, see
+    # core.renderers.
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Caches shared by all workers, see the README. Without REDIS_URL every
+# process has its own memory cache, which core.checks only allows for a
+# single process, while DEBUG.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+LOCAL_CACHES_ALLOWED = DEBUG
+
+# Token authentication cache, see user.authentication.
+# SHARED_CACHE names an entry of CACHES shared by all workers. None keeps a
+# MAX_SIZE cache in each process instead, which only suits a single one.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 4096,
+    'TTL': 60,
+    'SHARED_CACHE': 'default',
+}
+
+# Cache holding the per-user data versions, see core.versioning. It must be
+# shared by all workers so that ETags change with every write.
+DATA_VERSION_CACHE = 'default'
+
+# Gzip compression of responses under PATH_PREFIXES, see core.compression.
+# LEVEL trades ratio for latency. MIN_BYTES also decides which cached lists
+# are stored compressed.
+API_COMPRESSION = {
+    'PATH_PREFIXES': ['/api/'],
+    'MIN_BYTES': 1024,
+    'LEVEL': 3,
+    'MAX_RANDOM_BYTES': 100,
+}
+
+# Rendered list responses, see recipe.mixins.CachedListMixin.
+API_RESPONSE_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# Opt-in signed access tokens, see user.tokens. REVOCATION_CACHE should be
+# shared by all workers for logout to apply everywhere.
+SIGNED_TOKENS = {
+    'ENABLED': False,
+    'ACCESS_TTL': 300,
+    'REFRESH_TTL': 7 * 24 * 3600,
+    'REVOCATION_CACHE': 'default',
+}
+
+# Resized recipe image variants, see core.images. SIZES bound the longest
+# side in pixels. With ASYNC they are rendered by a pool of WORKERS threads
+# in each process after the upload commits.
+IMAGE_VARIANTS = {
+    'ASYNC': True,
+    'WORKERS': 2,
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+    'SIZES': {'thumb': 160, 'card': 640, 'full': 1600},
+}
+
+# Renditions served by <MEDIA_URL>resize/, see core.resize. CACHE_DIR
+# defaults to MEDIA_ROOT/cache, MAX_BYTES bounds its size.
+IMAGE_RESIZE = {
+    'CACHE_DIR': None,
+    'MAX_BYTES': 512 * 1024 * 1024,
+    'MAX_WIDTH': 2048,
+    'WIDTH_STEP': 16,
+    'QUALITY': 80,
+}
+
+# Limits checked while recipe images stream in, see recipe.uploads.
+IMAGE_UPLOADS = {
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'FORMATS': ['JPEG', 'PNG', 'GIF', 'WEBP'],
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Schema written by `manage.py build_schema` and served by /api/schema/.
+SCHEMA_ARTIFACT = os.environ.get('SCHEMA_ARTIFACT', '/vol/web/schema.json')
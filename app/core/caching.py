@@ -0,0 +1,41 @@
+'''
+Cache helpers.
+'''
+import time
+
+
+def get_or_compute(cache, key, compute, timeout, lock_timeout=10, wait=0.05):
+    '''Return the cached value for key, computing it once when missing.
+
+    Concurrent callers missing the same key wait on a lock in the cache
+    while one of them runs compute, so a burst of identical requests after
+    an invalidation computes the value once, across workers when they
+    share the cache. A None result from compute
+    is returned but not cached. Waiters give up after lock_timeout and
+    compute the value themselves.
+    '''
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + lock_timeout
+    locked = cache.add(lock_key, True, lock_timeout)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(wait)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        locked = cache.add(lock_key, True, lock_timeout)
+
+    try:
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+    return value
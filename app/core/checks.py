@@ -0,0 +1,64 @@
+'''
+System checks of the deployment settings.
+'''
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from user.authentication import get_cache_settings
+from user.tokens import get_signed_token_settings
+
+# Backends keeping their data in each process, or not at all.
+LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_caches():
+    '''Return the caches that must be shared by all workers, by setting.'''
+    caches = {
+        "TOKEN_AUTH_CACHE['SHARED_CACHE']": get_cache_settings()[
+            'SHARED_CACHE'
+        ],
+        'DATA_VERSION_CACHE': getattr(
+            settings, 'DATA_VERSION_CACHE', 'default'
+        ),
+        "API_RESPONSE_CACHE['CACHE']": settings.API_RESPONSE_CACHE['CACHE'],
+    }
+    tokens = get_signed_token_settings()
+    if tokens['ENABLED']:
+        caches["SIGNED_TOKENS['REVOCATION_CACHE']"] = (
+            tokens['REVOCATION_CACHE']
+        )
+    return caches
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    '''Refuse process-local caches where workers must share data.
+
+    LOCAL_CACHES_ALLOWED permits them for a single process, like the
+    development server.
+    '''
+    if getattr(settings, 'LOCAL_CACHES_ALLOWED', False):
+        return []
+
+    errors = []
+    for setting, alias in shared_caches().items():
+        if alias is None:
+            errors.append(Error(
+                f'{setting} names no cache, each process caches alone.',
+                hint='Name a cache shared by all workers.',
+                id='core.E001',
+            ))
+            continue
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in LOCAL_BACKENDS:
+            errors.append(Error(
+                f'{setting} names the {alias!r} cache, which is local to '
+                f'each process.',
+                hint='Set REDIS_URL, or configure CACHES with a backend '
+                     'shared by all workers.',
+                id='core.E001',
+            ))
+    return errors
@@ -0,0 +1,139 @@
+'''
+Gzip compression of API responses.
+
+Responses under the API path prefixes are compressed when the client
+accepts gzip and the body has at least MIN_BYTES. Streaming responses are
+compressed as they stream. Bodies rendered ahead of time can carry their
+compressed form in `compressed_content`, so cached lists (see
+recipe.mixins.CachedListMixin) are compressed once per cache fill.
+
+Against BREACH, every compressed response gets a random length file name
+in its gzip header, as with Django's GZipMiddleware, so the length of a
+response doesn't tell how well attacker input, like a search reflected in
+a cursor link, compressed along with the user's data. Padding a compressed
+body only rewrites its header.
+
+ETags are left strong, they derive from the user's data version rather
+than the bytes (see recipe.mixins.ConditionalMixin), and `If-Match` keeps
+working with either encoding. `Vary: Accept-Encoding` keeps caches from
+mixing them up.
+'''
+import gzip
+import secrets
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import StreamingBuffer
+
+DEFAULTS = {
+    'PATH_PREFIXES': ['/api/'],
+    'MIN_BYTES': 1024,
+    'LEVEL': 3,
+    'MAX_RANDOM_BYTES': 100,
+}
+
+# Offset of the flags byte and end of the fixed gzip header.
+FLAGS_OFFSET = 3
+HEADER_SIZE = 10
+
+
+def get_compression_settings():
+    return {**DEFAULTS, **getattr(settings, 'API_COMPRESSION', {})}
+
+
+def accepts_gzip(header):
+    '''Whether an `Accept-Encoding` header value allows gzip.'''
+    qualities = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def _random_name(options):
+    return b'a' * secrets.randbelow(options['MAX_RANDOM_BYTES'] + 1)
+
+
+def compress(content, options=None):
+    '''Return content compressed, without padding.'''
+    options = options or get_compression_settings()
+    return gzip.compress(content, compresslevel=options['LEVEL'], mtime=0)
+
+
+def pad(compressed, options=None):
+    '''Return a compressed body with a random length name in its header.'''
+    options = options or get_compression_settings()
+    name = _random_name(options)
+    if not name:
+        return compressed
+    header = bytearray(compressed[:HEADER_SIZE])
+    header[FLAGS_OFFSET] |= gzip.FNAME
+    return bytes(header) + name + b'\0' + compressed[HEADER_SIZE:]
+
+
+def compress_sequence(sequence, options=None):
+    '''Yield the chunks of sequence compressed as a single gzip stream.'''
+    options = options or get_compression_settings()
+    buffer = StreamingBuffer()
+    with gzip.GzipFile(
+        filename=_random_name(options).decode(),
+        mode='wb',
+        compresslevel=options['LEVEL'],
+        fileobj=buffer,
+        mtime=0,
+    ) as compressed:
+        yield buffer.read()
+        for chunk in sequence:
+            compressed.write(chunk)
+            data = buffer.read()
+            if data:
+                yield data
+    yield buffer.read()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    '''Compress API responses for clients accepting gzip.'''
+    def process_response(self, request, response):
+        options = get_compression_settings()
+        if not request.path.startswith(tuple(options['PATH_PREFIXES'])):
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        if response.streaming and response.is_async:
+            return response
+        if not response.streaming and (
+            len(response.content) < options['MIN_BYTES']
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not accepts_gzip(request.headers.get('Accept-Encoding', '')):
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                response.streaming_content, options
+            )
+            # The compressed size is only known once streamed.
+            del response.headers['Content-Length']
+        else:
+            compressed = getattr(response, 'compressed_content', None)
+            if compressed is None:
+                compressed = compress(response.content, options)
+            compressed = pad(compressed, options)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(response.content))
+
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
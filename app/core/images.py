@@ -0,0 +1,204 @@
+'''
+Resized variants of recipe images.
+
+After an upload commits, the variants configured in IMAGE_VARIANTS are
+rendered on a local thread pool and stored next to the original as
+`<original name>.<variant>.<ext>`. The recipe records the storage names in
+image_variants and the progress in image_status.
+
+Image files are stored by content and may be shared by several recipes,
+their variants with them. A file is released, deleted with its variants,
+once no recipe references it.
+'''
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import Recipe
+from core.versioning import bump_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,
+    'WORKERS': 2,
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+    'SIZES': {'thumb': 160, 'card': 640, 'full': 1600},
+}
+
+# Seconds during which a written or reused file may belong to an upload
+# that has not committed yet, such files are not released.
+RELEASE_GRACE = 60
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_variant_settings():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_VARIANTS', {})}
+
+
+def get_storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def variant_name(name, variant, options=None):
+    '''Return the storage name of a variant of the image name.'''
+    options = options or get_variant_settings()
+    return f'{name}.{variant}.{options["FORMAT"].lower()}'
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='image-variants',
+            )
+        return _executor
+
+
+def prepare_image(img, box):
+    '''Return img upright in RGB or RGBA, decoded at the scale box needs.
+
+    JPEG images are decoded at a reduced scale when box allows it.
+    '''
+    img.draft(img.mode, box)
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if img.has_transparency_data else 'RGB')
+    return img
+
+
+def _render(image_file, source, options):
+    '''Save every variant of the image file, return their storage names.'''
+    storage = get_storage()
+    sizes = sorted(options['SIZES'].items(), key=lambda item: -item[1])
+    names = {}
+    with Image.open(image_file) as img:
+        img = prepare_image(img, (sizes[0][1], sizes[0][1]))
+        # Each variant is reduced from the previous, larger one.
+        for variant, size in sizes:
+            img = img.copy()
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            img.save(buffer, format=options['FORMAT'],
+                     quality=options['QUALITY'])
+            names[variant] = storage.store(
+                variant_name(source, variant, options),
+                ContentFile(buffer.getvalue()),
+            )
+    return names
+
+
+def _existing_variants(source, options):
+    '''Return the variants of source if they were all rendered already.'''
+    storage = get_storage()
+    names = {
+        variant: variant_name(source, variant, options)
+        for variant in options['SIZES']
+    }
+    if all(storage.exists(name) for name in names.values()):
+        return names
+    return None
+
+
+def generate_variants(recipe_id, stale=(), force=False):
+    '''Render the variants of a recipe's image and record them.
+
+    stale lists variant files no longer configured to delete first.
+    Variants of a file shared with other recipes are reused, unless force
+    is set, e.g. because the size or quality of a variant changed. When the
+    image changed again meanwhile, the rendered files are released with it.
+    '''
+    storage = get_storage()
+    for name in stale:
+        storage.delete(name)
+
+    recipe = Recipe.objects.filter(id=recipe_id).only(
+        'id', 'user_id', 'image'
+    ).first()
+    if recipe is None or not recipe.image:
+        return
+
+    source = recipe.image.name
+    options = get_variant_settings()
+    try:
+        variants = None if force else _existing_variants(source, options)
+        if variants is None:
+            with recipe.image.open('rb') as image_file:
+                variants = _render(image_file, source, options)
+        status = Recipe.ImageStatus.READY
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Rendering variants of %s failed.', source)
+        variants, status = {}, Recipe.ImageStatus.FAILED
+
+    updated = Recipe.objects.filter(id=recipe_id, image=source).update(
+        image_status=status,
+        image_variants=variants,
+    )
+    if not updated:
+        release_image(source)
+        return
+
+    # Queryset updates send no signals.
+    bump_version(recipe.user_id)
+
+
+def release_image(name):
+    '''Delete an image file and its variants if no recipe uses them.
+
+    Files written or reused within RELEASE_GRACE seconds are kept, they are
+    left for the gc_images command.
+    '''
+    if not name or Recipe.objects.filter(image=name).exists():
+        return
+
+    storage = get_storage()
+    try:
+        age = timezone.now() - storage.get_modified_time(name)
+    except FileNotFoundError:
+        age = None
+    if age is not None and age.total_seconds() < RELEASE_GRACE:
+        return
+
+    options = get_variant_settings()
+    storage.delete(name)
+    for variant in options['SIZES']:
+        storage.delete(variant_name(name, variant, options))
+
+
+def _run(recipe_id, stale):
+    '''Worker entry point, threads keep no database connection.'''
+    try:
+        generate_variants(recipe_id, stale)
+    except Exception:
+        logger.exception('Image variants of recipe %s failed.', recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe, stale=()):
+    '''Generate the recipe's image variants once the transaction commits.
+
+    With IMAGE_VARIANTS['ASYNC'] disabled they are generated in the
+    committing thread instead of the worker pool.
+    '''
+    options = get_variant_settings()
+    if options['ASYNC']:
+        submit = partial(
+            _get_executor(options['WORKERS']).submit, _run
+        )
+    else:
+        submit = generate_variants
+    transaction.on_commit(partial(submit, recipe.id, list(stale)))
@@ -0,0 +1,112 @@
+'''
+Command to compare JOIN + DISTINCT filtering against EXISTS subqueries.
+'''
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe, Tag
+from recipe.filters import filter_assigned, filter_by_related
+
+
+class Rollback(Exception):
+    '''Raised to discard the seeded data once timings are taken.'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway user and time the recipe and tag filters with '
+        'JOIN + DISTINCT and with EXISTS. All data is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        '''Entrypoint for command'''
+        try:
+            with transaction.atomic():
+                user = self._seed(options)
+                self._report(user, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, options):
+        user = get_user_model().objects.create_user(
+            email='benchmark-filters@example.com',
+            password='benchmark',
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f'tag {i}') for i in range(options['tags'])
+        )
+        # A few tags stay unused so the assigned filter has work to do.
+        used = tags[:max(len(tags) - 5, 1)]
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(user=user, title=f'recipe {i}', time_minute=10,
+                       price='1.00')
+                for i in range(options['recipes'])
+            ),
+            batch_size=5000,
+        )
+        through = Recipe.tags.through
+        per_recipe = min(options['tags_per_recipe'], len(used))
+        through.objects.bulk_create(
+            (
+                through(recipe_id=recipe.id,
+                        tag_id=used[(n + k) % len(used)].id)
+                for n, recipe in enumerate(recipes)
+                for k in range(per_recipe)
+            ),
+            batch_size=5000,
+        )
+        self.stdout.write(
+            f'Seeded {len(recipes)} recipes with {per_recipe} tags each.'
+        )
+        return user
+
+    def _time(self, query_set, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(query_set.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def _report(self, user, options):
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)[:3]
+        )
+        recipes = Recipe.objects.filter(user=user)
+        tags = Tag.objects.filter(user=user)
+        size = options['page_size']
+        cases = (
+            (
+                'recipes by tags',
+                recipes.filter(tags__id__in=tag_ids)
+                .order_by('-id').distinct()[:size],
+                filter_by_related(recipes, 'tags', tag_ids)
+                .order_by('-id')[:size],
+            ),
+            (
+                'assigned tags',
+                tags.filter(recipe__isnull=False)
+                .order_by('-name').distinct(),
+                filter_assigned(tags, 'tags').order_by('-name'),
+            ),
+        )
+        for label, joined, exists in cases:
+            joined_ms = self._time(joined, options['repeat'])
+            exists_ms = self._time(exists, options['repeat'])
+            self.stdout.write(
+                f'{label}: join+distinct {joined_ms:.1f} ms, '
+                f'exists {exists_ms:.1f} ms'
+            )
@@ -0,0 +1,87 @@
+'''
+Command to compare the default JSON renderer against FastJSONRenderer.
+'''
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        'Time rendering recipe list pages, shaped like the API output, '
+        'with the default JSONRenderer and with FastJSONRenderer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _page(self, options):
+        '''Return a recipe list page as the list endpoint serializes it.'''
+        def items(prefix, count, n):
+            return [
+                {'id': n * count + k, 'name': f'{prefix} {k} é'}
+                for k in range(count)
+            ]
+
+        return {
+            'next': 'http://testserver/api/recipe/recipes/?cursor=cD0xMjM0',
+            'previous': None,
+            'results': [
+                {
+                    'id': n,
+                    'title': f'Recipe {n} — crème brûlée',
+                    'time_minute': n % 120,
+                    'price': f'{n % 1000}.50',
+                    'link': f'https://example.com/recipes/{n}',
+                    'tags': items('tag', options['tags_per_recipe'], n),
+                    'ingredients': items(
+                        'ingredient', options['ingredients_per_recipe'], n
+                    ),
+                }
+                for n in range(options['recipes'])
+            ],
+        }
+
+    def _time(self, render, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = render()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), content
+
+    def handle(self, *args, **options):
+        '''Entrypoint for command'''
+        page = self._page(options)
+        rows = page['results']
+        default, fast = JSONRenderer(), FastJSONRenderer()
+        cases = (
+            (
+                'list page',
+                lambda: default.render(page),
+                lambda: fast.render(page),
+            ),
+            (
+                'streamed array',
+                lambda: default.render(rows),
+                lambda: b''.join(fast.stream(rows)),
+            ),
+        )
+        for label, render_default, render_fast in cases:
+            default_ms, expected = self._time(render_default,
+                                              options['repeat'])
+            fast_ms, content = self._time(render_fast, options['repeat'])
+            same = 'same output' if content == expected else 'OUTPUT DIFFERS'
+            self.stdout.write(
+                f'{label}: default {default_ms:.2f} ms, '
+                f'fast {fast_ms:.2f} ms '
+                f'({default_ms / max(fast_ms, 1e-9):.1f}x), {same}, '
+                f'{len(expected)} bytes'
+            )
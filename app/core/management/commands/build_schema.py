@@ -0,0 +1,25 @@
+'''
+Command to pre-generate the OpenAPI schema served by /api/schema/.
+'''
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import write_schema
+
+
+class Command(BaseCommand):
+    help = 'Write the OpenAPI schema artifact served by the schema view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=settings.SCHEMA_ARTIFACT,
+            help='Path of the schema artifact.',
+        )
+
+    def handle(self, *args, **options):
+        '''Entrypoint for command'''
+        write_schema(options['file'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Schema written to {options["file"]}.')
+        )
@@ -0,0 +1,82 @@
+'''
+Command to print the query plans of the API list queries.
+'''
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from core.models import Ingredient, Tag
+from recipe.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Print EXPLAIN output for each query the API lists run, built '
+        'through the viewsets themselves, for one user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='User whose data is queried, defaults to the first user.',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries and show actual timings (PostgreSQL).',
+        )
+
+    def _get_user(self, email):
+        users = get_user_model().objects.order_by('id')
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('No user to explain queries for.')
+        return user
+
+    def _list_queryset(self, viewset, user, params=None):
+        '''Return the queryset the viewset lists for user with params.'''
+        view = viewset(action='list', format_kwarg=None, kwargs={})
+        view.request = Request(RequestFactory().get('/', params or {}))
+        view.request.user = user
+        query_set = view.get_queryset()
+        if view.pagination_class is not None:
+            query_set = query_set[:view.pagination_class.page_size]
+        return query_set
+
+    def _queries(self, user):
+        tag_ids = ','.join(
+            str(pk) for pk in
+            Tag.objects.filter(user=user).values_list('id', flat=True)[:2]
+        ) or '0'
+        for label, viewset, params in (
+            ('recipe list', RecipeViewSet, None),
+            ('recipes by any tag', RecipeViewSet, {'tags': tag_ids}),
+            ('recipes by all tags', RecipeViewSet,
+             {'tags': tag_ids, 'match': 'all'}),
+            ('recipe search', RecipeViewSet, {'search': 'pasta'}),
+            ('tag list', TagViewSet, None),
+            ('assigned tags', TagViewSet, {'assigned_only': 1}),
+            ('ingredient list', IngredientViewSet, None),
+            ('assigned ingredients', IngredientViewSet, {'assigned_only': 1}),
+        ):
+            yield label, self._list_queryset(viewset, user, params)
+        for model in (Tag, Ingredient):
+            yield (
+                f'{model._meta.verbose_name} lookup by name',
+                model.objects.filter_by_lower_names(user, ['salt']),
+            )
+
+    def handle(self, *args, **options):
+        '''Entrypoint for command'''
+        user = self._get_user(options['email'])
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        for label, query_set in self._queries(user):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(str(query_set.query))
+            self.stdout.write(query_set.explain(**explain_options))
+            self.stdout.write('')
@@ -0,0 +1,157 @@
+'''
+Command to delete recipe image files no recipe references.
+'''
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.images import get_storage
+from core.models import Recipe
+
+
+def walk(root, resume=()):
+    '''Yield the path parts of files under root in a stable sorted order.
+
+    Files up to and including the resume parts are skipped, along with
+    whole directories sorted before them.
+    '''
+    def visit(directory, parts):
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            path = parts + (entry.name,)
+            if entry.is_dir(follow_symlinks=False):
+                if path >= resume[:len(path)]:
+                    yield from visit(entry.path, path)
+            elif path > resume:
+                yield path
+
+    yield from visit(root, ())
+
+
+def owners(name):
+    '''Return the image names a file may belong to.
+
+    A variant `<image>.<variant>.<ext>` belongs to its image.
+    '''
+    candidates = [name]
+    stem, _ = os.path.splitext(name)
+    stem, variant = os.path.splitext(stem)
+    if variant and os.path.splitext(stem)[1]:
+        candidates.append(stem)
+    return candidates
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete recipe image files, and their variants, that no recipe '
+        'references. Use --checkpoint with --max-files to spread the work '
+        'over periodic runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='uploads/recipe',
+            help='Directory of the recipe images in the storage.',
+        )
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the files without deleting them.')
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Seconds since a file was written or reused before it may '
+                 'be deleted, protecting uploads not committed yet.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--max-files',
+            type=int,
+            help='Stop after examining this many files.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording where a run stopped, the next run resumes '
+                 'from there.',
+        )
+
+    def _read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return ()
+        with open(path) as checkpoint:
+            content = checkpoint.read().strip()
+        return tuple(content.split('/')) if content else ()
+
+    def _write_checkpoint(self, path, parts):
+        if parts:
+            with open(path, 'w') as checkpoint:
+                checkpoint.write('/'.join(parts))
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _collect(self, batch, options):
+        '''Delete the unreferenced files of batch, return their sizes.'''
+        candidates = {name: owners(name) for name, _ in batch}
+        referenced = set(
+            Recipe.objects.filter(
+                image__in={o for names in candidates.values() for o in names}
+            ).values_list('image', flat=True)
+        )
+        cutoff = time.time() - options['min_age']
+        freed = []
+        for name, path in batch:
+            if referenced.intersection(candidates[name]):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {name}')
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+            freed.append(stat.st_size)
+        return freed
+
+    def handle(self, *args, **options):
+        '''Entrypoint for command'''
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        prefix = options['prefix'].strip('/')
+        root = get_storage().path(prefix)
+        checkpoint = options['checkpoint']
+        resume = self._read_checkpoint(checkpoint)
+
+        examined, freed, batch, last = 0, [], [], resume
+        finished = True
+        for parts in walk(root, resume):
+            if options['max_files'] and examined >= options['max_files']:
+                finished = False
+                break
+            batch.append(('/'.join((prefix,) + parts),
+                          os.path.join(root, *parts)))
+            examined += 1
+            last = parts
+            if len(batch) >= options['batch_size']:
+                freed += self._collect(batch, options)
+                batch = []
+        if batch:
+            freed += self._collect(batch, options)
+
+        if checkpoint and not options['dry_run']:
+            self._write_checkpoint(checkpoint, () if finished else last)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'Examined {examined} files. {verb} {len(freed)} files, '
+            f'{sum(freed)} bytes.'
+        ))
@@ -0,0 +1,47 @@
+'''
+Command to render the image variants of existing recipes.
+'''
+from django.core.management.base import BaseCommand
+
+from core.images import generate_variants, get_variant_settings, variant_name
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Render missing image variants, e.g. after changing IMAGE_VARIANTS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Render again the variants of recipes that already have '
+                 'them, e.g. after changing their sizes or quality.',
+        )
+
+    def handle(self, *args, **options):
+        '''Entrypoint for command'''
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.exclude(image_status=Recipe.ImageStatus.READY)
+
+        variant_options = get_variant_settings()
+        rendered = set()
+        count = 0
+        for recipe in recipes.only('id', 'image', 'image_variants').iterator():
+            expected = {
+                variant_name(recipe.image.name, variant, variant_options)
+                for variant in variant_options['SIZES']
+            }
+            stale = [
+                name for name in recipe.image_variants.values()
+                if name not in expected
+            ]
+            # Files shared by recipes are rendered again once.
+            force = options['all'] and recipe.image.name not in rendered
+            generate_variants(recipe.id, stale, force=force)
+            rendered.add(recipe.image.name)
+            count += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rendered variants of {count} recipes.')
+        )
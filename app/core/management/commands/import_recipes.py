@@ -0,0 +1,340 @@
+'''
+Command to bulk load recipes from NDJSON or CSV.
+'''
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import ImportProgress, Ingredient, Recipe, Tag
+from core.search import update_search_index
+from core.versioning import bump_version
+
+RELATIONS = (('tags', Tag), ('ingredients', Ingredient))
+
+# Columns written for each recipe, the others keep their database default.
+RECIPE_COLUMNS = (
+    'id',
+    'user',
+    'title',
+    'time_minute',
+    'price',
+    'description',
+    'link',
+    'image_status',
+    'image_variants',
+)
+
+
+class RecordError(ValueError):
+    '''Raised for a record that can't be imported.'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Load recipes from NDJSON or CSV in the export format. Rows are '
+        'loaded in batches, with COPY on PostgreSQL. Records that can\'t '
+        'be imported, those of unknown users included, are reported and '
+        'skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read, - for stdin.')
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            help='Input format, guessed from the file extension by default.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email of the owner of records without a user field.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Name under which the records read are recorded in the '
+                 'database with each batch, a rerun resumes after them.',
+        )
+
+    def _records(self, stream, input_format):
+        '''Yield the records of stream, CSV rows as dicts, NDJSON lines as
+        they are.'''
+        if input_format == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            if line.strip():
+                yield line
+
+    def _parse(self, record):
+        '''Return a record as a dict, decoding NDJSON lines.'''
+        if isinstance(record, str):
+            try:
+                record = json.loads(record)
+            except ValueError:
+                raise RecordError('not valid JSON.')
+        if not isinstance(record, dict):
+            raise RecordError('not a JSON object.')
+        return record
+
+    def _names(self, value, model):
+        '''Return the distinct names of a list or `;` separated cell.'''
+        if isinstance(value, str):
+            value = value.split(';')
+        elif value is None:
+            value = []
+        elif not isinstance(value, list):
+            raise RecordError(f'{model.__name__} names must be a list or '
+                              f'a ; separated string.')
+        names = [str(name).strip() for name in value]
+        max_length = model._meta.get_field('name').max_length
+        if any(len(name) > max_length for name in names):
+            raise RecordError(f'{model.__name__} names are limited to '
+                              f'{max_length} characters.')
+        return list(dict.fromkeys(name for name in names if name))
+
+    def _clean(self, record, default_user):
+        '''Return the importable values of a record.'''
+        record = self._parse(record)
+        title = str(record.get('title') or '').strip()
+        if not title or len(title) > 255:
+            raise RecordError('title is required, up to 255 characters.')
+        link = str(record.get('link') or '')
+        if len(link) > 255:
+            raise RecordError('link is limited to 255 characters.')
+        try:
+            time_minute = int(record.get('time_minute'))
+            price = Decimal(str(record.get('price'))).quantize(
+                Decimal('0.01')
+            )
+        except (TypeError, ValueError, InvalidOperation):
+            raise RecordError('time_minute and price must be numbers.')
+        if not price.is_finite() or abs(price) >= 1000:
+            raise RecordError('price must be below 1000.')
+        user = record.get('user') or default_user
+        if not user:
+            raise RecordError('user is required without --user.')
+        if not isinstance(user, str):
+            raise RecordError('user must be an email.')
+
+        return {
+            'user': user,
+            'title': title,
+            'time_minute': time_minute,
+            'price': price,
+            'description': str(record.get('description') or ''),
+            'link': link,
+            **{
+                field: self._names(record.get(field), model)
+                for field, model in RELATIONS
+            },
+        }
+
+    def _users(self, emails):
+        '''Return the known users by email, reading new ones from the db.'''
+        missing = set(emails) - set(self.users)
+        if missing:
+            self.users.update(
+                (user.email, user)
+                for user in get_user_model().objects.filter(email__in=missing)
+            )
+        return self.users
+
+    def _resolve(self, rows):
+        '''Replace emails by users, names of tags and ingredients by ids.'''
+        users = self._users({row['user'] for row in rows})
+        for row in rows:
+            row['user'] = users[row['user']]
+
+        for field, model in RELATIONS:
+            by_user = {}
+            for row in rows:
+                by_user.setdefault(row['user'], []).extend(row[field])
+            related = {
+                user: model.objects.get_or_create_by_names(user, names)
+                for user, names in by_user.items()
+            }
+            for row in rows:
+                row[field] = {
+                    related[row['user']][name].id for name in row[field]
+                }
+
+    def _reserve_ids(self, count):
+        '''Return count new recipe ids from the table's sequence.'''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [Recipe._meta.db_table, Recipe._meta.pk.column, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _copy(self, table, columns, values):
+        '''Load values into table with COPY.'''
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_ALL).writerows(values)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                    connection.ops.quote_name(table),
+                    ', '.join(map(connection.ops.quote_name, columns)),
+                ),
+                buffer,
+            )
+
+    def _load_copy(self, rows):
+        '''Load rows with COPY, return the new recipe ids.'''
+        ids = self._reserve_ids(len(rows))
+        self._copy(
+            Recipe._meta.db_table,
+            [Recipe._meta.get_field(name).column for name in RECIPE_COLUMNS],
+            (
+                [recipe_id, row['user'].id, row['title'], row['time_minute'],
+                 row['price'], row['description'], row['link'],
+                 Recipe.ImageStatus.NONE, '{}']
+                for recipe_id, row in zip(ids, rows)
+            ),
+        )
+        for field, _ in RELATIONS:
+            relation = getattr(Recipe, field)
+            self._copy(
+                relation.through._meta.db_table,
+                [relation.field.m2m_column_name(),
+                 relation.field.m2m_reverse_name()],
+                (
+                    [recipe_id, related_id]
+                    for recipe_id, row in zip(ids, rows)
+                    for related_id in row[field]
+                ),
+            )
+        return ids
+
+    def _load_bulk(self, rows):
+        '''Load rows with bulk_create, return the new recipe ids.'''
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=row['user'],
+                title=row['title'],
+                time_minute=row['time_minute'],
+                price=row['price'],
+                description=row['description'],
+                link=row['link'],
+            )
+            for row in rows
+        ])
+        for field, _ in RELATIONS:
+            relation = getattr(Recipe, field)
+            source = relation.field.m2m_column_name()
+            target = relation.field.m2m_reverse_name()
+            relation.through.objects.bulk_create(
+                [
+                    relation.through(**{
+                        source: recipe.id,
+                        target: related_id,
+                    })
+                    for recipe, row in zip(recipes, rows)
+                    for related_id in row[field]
+                ],
+                batch_size=self.batch_size,
+            )
+        return [recipe.id for recipe in recipes]
+
+    def _import(self, rows, checkpoint, done):
+        '''Load a batch of clean rows and record the progress in one
+        transaction.'''
+        with transaction.atomic():
+            if rows:
+                self._resolve(rows)
+                if connection.vendor == 'postgresql':
+                    ids = self._load_copy(rows)
+                else:
+                    ids = self._load_bulk(rows)
+                update_search_index(ids)
+                for user in {row['user'] for row in rows}:
+                    bump_version(user.id)
+            if checkpoint:
+                ImportProgress.objects.update_or_create(
+                    name=checkpoint, defaults={'records': done}
+                )
+
+    def _read_checkpoint(self, name):
+        if not name:
+            return 0
+        return ImportProgress.objects.filter(name=name).values_list(
+            'records', flat=True
+        ).first() or 0
+
+    def handle(self, *args, **options):
+        '''Entrypoint for command'''
+        path = options['path']
+        input_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        self.batch_size = options['batch_size']
+        self.users = {}
+        if options['user'] and options['user'] not in self._users(
+            {options['user']}
+        ):
+            raise CommandError(f'Unknown user: {options["user"]}.')
+        checkpoint = options['checkpoint']
+        done = self._read_checkpoint(checkpoint)
+
+        stream = sys.stdin if path == '-' else open(path, newline='')
+        try:
+            records = itertools.islice(
+                self._records(stream, input_format), done, None
+            )
+            self._run(records, done, options)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def _run(self, records, done, options):
+        imported = skipped = 0
+        start = time.monotonic()
+        while True:
+            batch = list(itertools.islice(records, self.batch_size))
+            if not batch:
+                break
+            cleaned = []
+            for number, record in enumerate(batch, done + 1):
+                try:
+                    row = self._clean(record, options['user'])
+                except RecordError as exc:
+                    skipped += 1
+                    self.stderr.write(f'Record {number} skipped: {exc}')
+                else:
+                    cleaned.append((number, row))
+            users = self._users({row['user'] for _, row in cleaned})
+            rows = []
+            for number, row in cleaned:
+                if row['user'] in users:
+                    rows.append(row)
+                else:
+                    skipped += 1
+                    self.stderr.write(
+                        f'Record {number} skipped: unknown user '
+                        f'{row["user"]}.'
+                    )
+            done += len(batch)
+            self._import(rows, options['checkpoint'], done)
+            imported += len(rows)
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f'{done} records read, {imported} imported, '
+                f'{imported / elapsed:.0f} rows/s.'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes, skipped {skipped}.'
+        ))
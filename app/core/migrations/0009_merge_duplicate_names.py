@@ -0,0 +1,53 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:25
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    '''Merge tags and ingredients sharing a (user, name) pair.
+
+    Recipes linked to a duplicate are relinked to the oldest object of the
+    group before the duplicates are deleted.
+    '''
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        target = model_name.lower()
+        groups = (
+            model.objects.values('user', 'name')
+            .annotate(keep=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for group in groups:
+            duplicates = model.objects.filter(
+                user=group['user'], name=group['name']
+            ).exclude(id=group['keep'])
+            recipe_ids = through.objects.filter(
+                **{f'{target}__in': duplicates}
+            ).values_list('recipe_id', flat=True)
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe_id, **{
+                        f'{target}_id': group['keep']
+                    })
+                    for recipe_id in set(recipe_ids)
+                ],
+                ignore_conflicts=True,
+            )
+            duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop,
+        ),
+    ]
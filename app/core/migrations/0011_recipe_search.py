@@ -0,0 +1,78 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:38
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+FTS_TABLE = 'core_recipe_fts'
+
+
+def _names(relation, table, aggregate):
+    '''SQL aggregating the names of a recipe's tags or ingredients.'''
+    return (
+        f"COALESCE((SELECT {aggregate} FROM core_recipe_{relation} AS link "
+        f"JOIN core_{table} AS item ON item.id = link.{table}_id "
+        f"WHERE link.recipe_id = recipe.id), '')"
+    )
+
+
+def create_search_index(apps, schema_editor):
+    '''Create the vendor specific search index and fill it.
+
+    The documents are built in SQL, as of this migration, rather than by
+    core.search, which follows the current models.
+    '''
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            'title, description, tags, ingredients, '
+            "tokenize='porter unicode61')"
+        )
+        aggregate = "group_concat(item.name, ' ')"
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} '
+            '(rowid, title, description, tags, ingredients) '
+            'SELECT recipe.id, recipe.title, recipe.description, '
+            f"{_names('tags', 'tag', aggregate)}, "
+            f"{_names('ingredients', 'ingredient', aggregate)} "
+            'FROM core_recipe AS recipe'
+        )
+    elif vendor == 'postgresql':
+        aggregate = "string_agg(item.name, ' ')"
+        schema_editor.execute(
+            'UPDATE core_recipe AS recipe SET search_vector = '
+            "setweight(to_tsvector('english', recipe.title), 'A') || "
+            "setweight(to_tsvector('english', "
+            f"{_names('tags', 'tag', aggregate)} || ' ' || "
+            f"{_names('ingredients', 'ingredient', aggregate)}"
+            "), 'B') || "
+            "setweight(to_tsvector('english', recipe.description), 'C')"
+        )
+        schema_editor.execute(
+            'CREATE INDEX core_recipe_search_idx '
+            'ON core_recipe USING gin (search_vector)'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX core_recipe_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_unique_tag_ingredient_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
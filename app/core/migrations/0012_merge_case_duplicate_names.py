@@ -0,0 +1,55 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:45
+
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def merge_case_duplicate_names(apps, schema_editor):
+    '''Merge tags and ingredients whose names differ only by case.
+
+    Recipes linked to a duplicate are relinked to the oldest object of the
+    group before the duplicates are deleted.
+    '''
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        target = model_name.lower()
+        named = model.objects.annotate(lower_name=Lower('name'))
+        groups = (
+            named.values('user', 'lower_name')
+            .annotate(keep=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for group in groups:
+            duplicates = named.filter(
+                user=group['user'], lower_name=group['lower_name']
+            ).exclude(id=group['keep'])
+            recipe_ids = through.objects.filter(
+                **{f'{target}__in': duplicates.values('id')}
+            ).values_list('recipe_id', flat=True)
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe_id, **{
+                        f'{target}_id': group['keep']
+                    })
+                    for recipe_id in set(recipe_ids)
+                ],
+                ignore_conflicts=True,
+            )
+            model.objects.filter(id__in=duplicates.values('id')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_case_duplicate_names,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -2,13 +2,17 @@
 import uuid
 import os
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core.storage import recipe_image_storage
+
 
 def recipe_image_file_path(instance, filename):
     '''Create and return the file path of a recipe's image.'''
@@ -47,6 +51,73 @@ class UserManager(BaseUserManager):
         return user
 
 
+class NamedObjectManager(models.Manager):
+    '''Manager for objects whose name is unique per user, ignoring case.'''
+    # Names lowercased per query, below every backend's parameter limit.
+    LOWER_BATCH_SIZE = 500
+
+    def filter_by_lower_names(self, user, keys):
+        '''Return the user's objects whose lowercased name is in keys.
+
+        The lowercased name is selected as `lower_name`.
+        '''
+        return self.annotate(lower_name=Lower('name')).filter(
+            user=user, lower_name__in=keys
+        )
+
+    def lower_names(self, names):
+        '''Return names mapped to their lowercase as the database has it.
+
+        SQL LOWER() and str.lower() disagree outside ASCII, SQLite only
+        lowers ASCII letters, so keys are never computed in Python.
+        '''
+        lowered = {}
+        with connections[self.db].cursor() as cursor:
+            for start in range(0, len(names), self.LOWER_BATCH_SIZE):
+                batch = names[start:start + self.LOWER_BATCH_SIZE]
+                cursor.execute(
+                    'SELECT ' + ', '.join(['LOWER(%s)'] * len(batch)), batch
+                )
+                lowered.update(zip(batch, cursor.fetchone()))
+        return lowered
+
+    def get_or_create_by_names(self, user, names):
+        '''Return the user's objects for names, creating missing ones.
+
+        Names match case-insensitively, a new object takes the first
+        spelling given. Missing objects are inserted with a single
+        bulk_create that ignores conflicts, so concurrent creates can't race
+        into duplicates. Those rows are then read back in one query to get
+        their ids.
+        '''
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+
+        keys = self.lower_names(names)
+        spellings = {}
+        for name in names:
+            spellings.setdefault(keys[name], name)
+
+        objects = {
+            obj.lower_name: obj
+            for obj in self.filter_by_lower_names(user, list(spellings))
+        }
+        missing = [key for key in spellings if key not in objects]
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=spellings[key])
+                 for key in missing],
+                ignore_conflicts=True,
+            )
+            objects.update({
+                obj.lower_name: obj
+                for obj in self.filter_by_lower_names(user, missing)
+            })
+
+        return {name: objects[keys[name]] for name in names}
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     '''User in the system custom model.'''
     email = models.EmailField(max_length=255, unique=True)
@@ -61,6 +132,12 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Recipe(models.Model):
     '''Recipe object.'''
+    class ImageStatus(models.TextChoices):
+        NONE = 'none'
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -72,10 +149,38 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
+    # Stored by content, a file may be shared by several recipes.
     image = models.ImageField(
         blank=True,
         null=True,
-        upload_to=recipe_image_file_path)
+        upload_to=recipe_image_file_path,
+        storage=recipe_image_storage)
+    # Resized copies of image, see core.images.
+    image_status = models.CharField(
+        max_length=10,
+        choices=ImageStatus.choices,
+        default=ImageStatus.NONE,
+        editable=False,
+    )
+    image_variants = models.JSONField(default=dict, editable=False)
+    # Maintained by core.search, only used on PostgreSQL.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Recipe lists filter by user and page in -id order.
+            models.Index(fields=['user', '-id'],
+                         name='recipe_user_id_desc_idx'),
+            # Counts the recipes sharing an image file.
+            models.Index(fields=['image'], name='recipe_image_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stored image name, released by core.signals once replaced.
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
 
     def __str__(self):
         return self.title
@@ -89,6 +194,20 @@ class Tag(models.Model):
     )
     name = models.CharField(max_length=100)
 
+    objects = NamedObjectManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                'user', Lower('name'),
+                name='unique_tag_name_ci_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-name'],
+                         name='tag_user_name_desc_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -101,5 +220,33 @@ class Ingredient(models.Model):
     )
     name = models.CharField(max_length=255)
 
+    objects = NamedObjectManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                'user', Lower('name'),
+                name='unique_ingredient_name_ci_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-name'],
+                         name='ingredient_user_name_desc_idx'),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class ImportProgress(models.Model):
+    '''Records read by a resumable import, see the import_recipes command.
+
+    Updated in the transaction of each batch, so a resumed import never
+    loads a committed batch again.
+    '''
+    name = models.CharField(max_length=255, unique=True)
+    records = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.records}'
@@ -0,0 +1,255 @@
+'''
+On-the-fly resizing of recipe images.
+
+`<MEDIA_URL>resize/<image name>?w=<width>&fmt=<format>` renders the image
+at that width on first request and keeps the rendition in a size-bounded
+disk cache, evicting the least recently used renditions. Image names are
+content addressed, so renditions never change and are served with
+immutable cache headers. Concurrent requests for a missing rendition wait
+for a single render.
+'''
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponseBadRequest,
+)
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+from PIL import Image
+
+from core.images import get_storage, prepare_image
+from core.models import Recipe
+
+DEFAULTS = {
+    'CACHE_DIR': None,
+    'MAX_BYTES': 512 * 1024 * 1024,
+    'MAX_WIDTH': 2048,
+    'WIDTH_STEP': 16,
+    'QUALITY': 80,
+    'FORMATS': {'webp': 'WEBP', 'jpeg': 'JPEG', 'png': 'PNG'},
+}
+
+# Eviction brings the cache down to this share of MAX_BYTES.
+EVICT_TO = 0.9
+
+# Lock files shared by the renditions, keyed by their first hex digit pair.
+LOCK_STRIPES = 256
+
+CONTENT_TYPES = {
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+_cache_size = None
+_cache_size_lock = threading.Lock()
+
+
+def get_resize_settings():
+    options = {**DEFAULTS, **getattr(settings, 'IMAGE_RESIZE', {})}
+    if options['CACHE_DIR'] is None:
+        options['CACHE_DIR'] = os.path.join(settings.MEDIA_ROOT, 'cache')
+    return options
+
+
+def rendition_key(name, width, image_format, options):
+    '''Return the cache key of a rendition.'''
+    source = f'{name}\0{width}\0{image_format}\0{options["QUALITY"]}'
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def rendition_path(key, image_format, options):
+    return os.path.join(
+        options['CACHE_DIR'], key[:2], f'{key}.{image_format.lower()}'
+    )
+
+
+class _RenditionLock:
+    '''Exclusive lock on a rendition, across threads and processes.'''
+    def __init__(self, key, options):
+        directory = os.path.join(options['CACHE_DIR'], 'locks')
+        os.makedirs(directory, exist_ok=True)
+        stripe = int(key[:2], 16) % LOCK_STRIPES
+        self.path = os.path.join(directory, f'{stripe:02x}.lock')
+
+    def __enter__(self):
+        # Each open file description holds its own flock, so threads of
+        # one process exclude each other as well.
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _open_cached(path):
+    '''Open a cached rendition and mark it as recently used, or None.'''
+    try:
+        rendition = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    os.utime(rendition.fileno())
+    return rendition
+
+
+def _is_recipe_image(name):
+    '''Whether name is the image of a recipe, not another media file.'''
+    return Recipe.objects.filter(image=name).exists()
+
+
+def _render(name, width, image_format, options):
+    '''Return the bytes of the image name resized to width.'''
+    with get_storage().open(name, 'rb') as image_file:
+        with Image.open(image_file) as img:
+            width = min(width, img.width)
+            height = max(round(img.height * width / img.width), 1)
+            img = prepare_image(img, (width, height))
+            img = img.resize((width, height), Image.Resampling.LANCZOS)
+            if image_format == 'JPEG' and img.mode == 'RGBA':
+                img = img.convert('RGB')
+            buffer = BytesIO()
+            img.save(buffer, format=image_format,
+                     quality=options['QUALITY'])
+    return buffer.getvalue()
+
+
+def _write(path, content):
+    '''Write content to path atomically.'''
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.rendition-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _cached_files(options):
+    '''Return (mtime, size, path) of every cached rendition.'''
+    files = []
+    for entry in os.scandir(options['CACHE_DIR']):
+        if not entry.is_dir() or entry.name == 'locks':
+            continue
+        for rendition in os.scandir(entry.path):
+            if rendition.name.startswith('.'):
+                continue
+            try:
+                stat = rendition.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, rendition.path))
+    return files
+
+
+def evict(options):
+    '''Delete least recently used renditions until the cache fits.
+
+    Return the size left. The whole cache is scanned, so the size tracked
+    by each process is corrected when it evicts.
+    '''
+    files = sorted(_cached_files(options))
+    size = sum(file_size for _, file_size, _ in files)
+    target = options['MAX_BYTES'] * EVICT_TO
+    for _, file_size, path in files:
+        if size <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        size -= file_size
+    return size
+
+
+def _account(added, options):
+    '''Add a new rendition to the tracked cache size, evicting if needed.'''
+    global _cache_size
+    with _cache_size_lock:
+        if _cache_size is None:
+            _cache_size = sum(size for _, size, _ in _cached_files(options))
+        else:
+            _cache_size += added
+        if _cache_size > options['MAX_BYTES']:
+            _cache_size = evict(options)
+
+
+def get_rendition(name, width, image_format, options=None):
+    '''Return an open file of the rendition, rendering it when missing.'''
+    options = options or get_resize_settings()
+    key = rendition_key(name, width, image_format, options)
+    path = rendition_path(key, image_format, options)
+
+    rendition = _open_cached(path)
+    if rendition is not None:
+        return rendition
+
+    with _RenditionLock(key, options):
+        # Another request may have rendered it while this one waited.
+        rendition = _open_cached(path)
+        if rendition is not None:
+            return rendition
+
+        if not _is_recipe_image(name):
+            raise Http404('No such image.')
+        content = _render(name, width, image_format, options)
+        _write(path, content)
+        rendition = open(path, 'rb')
+
+    _account(len(content), options)
+    return rendition
+
+
+def _parse_width(value, options):
+    '''Return the requested width rounded up to WIDTH_STEP, or None.'''
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        return None
+    if not 0 < width <= options['MAX_WIDTH']:
+        return None
+    step = options['WIDTH_STEP']
+    return min(-(-width // step) * step, options['MAX_WIDTH'])
+
+
+@require_safe
+def resize_image(request, name):
+    '''Serve the recipe image name resized to the requested width.'''
+    options = get_resize_settings()
+    width = _parse_width(request.GET.get('w'), options)
+    image_format = options['FORMATS'].get(request.GET.get('fmt', 'webp'))
+    if width is None or image_format is None:
+        return HttpResponseBadRequest(
+            f'w must be 1 to {options["MAX_WIDTH"]}, fmt one of '
+            f'{", ".join(options["FORMATS"])}.'
+        )
+
+    # Cached renditions outlive released images, and the media directory
+    # holds other files, serve only current recipe images.
+    if not _is_recipe_image(name) or not get_storage().exists(name):
+        raise Http404('No such image.')
+
+    etag = '"{}"'.format(rendition_key(name, width, image_format, options))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(
+            get_rendition(name, width, image_format, options),
+            content_type=CONTENT_TYPES[image_format],
+        )
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=365 * 24 * 3600,
+                        immutable=True)
+    return response
@@ -0,0 +1,142 @@
+'''
+Pre-built OpenAPI schema served from memory.
+
+`manage.py build_schema` writes the schema to SCHEMA_ARTIFACT at build or
+deploy time. The schema view loads it once, renders each format once and
+serves the bytes with validators and a gzip variant. Without an artifact
+the schema is generated on the first request.
+'''
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_string
+from drf_spectacular.renderers import OpenApiJsonRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+from core.compression import accepts_gzip
+
+_lock = threading.Lock()
+_schema = None
+_rendered = {}
+
+
+def generate_schema():
+    '''Generate and return the public schema of the API.'''
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        urlconf=spectacular_settings.SERVE_URLCONF,
+    )
+    return generator.get_schema(
+        request=None,
+        public=spectacular_settings.SERVE_PUBLIC,
+    )
+
+
+def write_schema(path):
+    '''Generate the schema and atomically write it as JSON to path.'''
+    content = OpenApiJsonRenderer().render(generate_schema())
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+        tmp.write(content)
+    try:
+        # Created private to its owner, the server may run as another user.
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.remove(tmp.name)
+        raise
+
+
+def _load_schema():
+    '''Return the schema and its modification time, loading it once.'''
+    global _schema
+    if _schema is None:
+        path = settings.SCHEMA_ARTIFACT
+        if os.path.exists(path):
+            with open(path, 'rb') as artifact:
+                _schema = (json.load(artifact), os.path.getmtime(path))
+        else:
+            _schema = (generate_schema(), time.time())
+    return _schema
+
+
+def get_rendered_schema(renderer):
+    '''Return the schema rendered by renderer, with its validators.
+
+    The result is a dict of the body, its gzip variant, the ETag and the
+    Last-Modified timestamp, computed once per media type.
+    '''
+    rendered = _rendered.get(renderer.media_type)
+    if rendered is None:
+        with _lock:
+            rendered = _rendered.get(renderer.media_type)
+            if rendered is None:
+                data, modified = _load_schema()
+                body = renderer.render(data, renderer.media_type)
+                rendered = {
+                    'body': body,
+                    'gzip': compress_string(body),
+                    'etag': f'"{hashlib.sha1(body).hexdigest()}"',
+                    'last_modified': int(modified),
+                }
+                _rendered[renderer.media_type] = rendered
+    return rendered
+
+
+def clear_schema_cache():
+    '''Forget the loaded schema so the next request reloads it.'''
+    global _schema
+    with _lock:
+        _schema = None
+        _rendered.clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    '''Schema view serving the pre-built schema from memory.
+
+    Requests for a specific version or language fall back to generating
+    the schema on the fly.
+    '''
+    def _get_schema_response(self, request):
+        if (
+            self.api_version or request.version
+            or request.GET.get('version') or request.GET.get('lang')
+        ):
+            return super()._get_schema_response(request)
+
+        renderer = request.accepted_renderer
+        rendered = get_rendered_schema(renderer)
+        response = get_conditional_response(
+            request,
+            etag=rendered['etag'],
+            last_modified=rendered['last_modified'],
+        )
+        if response is None:
+            use_gzip = accepts_gzip(
+                request.headers.get('Accept-Encoding', '')
+            )
+            response = HttpResponse(
+                rendered['gzip'] if use_gzip else rendered['body'],
+                content_type=(
+                    f'{renderer.media_type}; charset={renderer.charset}'
+                    if renderer.charset else renderer.media_type
+                ),
+            )
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+            response['Content-Disposition'] = (
+                f'inline; filename="{self._get_filename(request, None)}"'
+            )
+
+        response['ETag'] = rendered['etag']
+        response['Last-Modified'] = http_date(rendered['last_modified'])
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        return response
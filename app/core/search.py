@@ -0,0 +1,138 @@
+'''
+Full-text search over recipes.
+
+On PostgreSQL each recipe keeps a weighted tsvector of its title, tag and
+ingredient names and description in `Recipe.search_vector`, backed by a
+GIN index. On SQLite the same documents live in the FTS5 table
+`core_recipe_fts`. Documents are refreshed when recipes or their
+relations are saved.
+'''
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'core_recipe_fts'
+SEARCH_CONFIG = 'english'
+# bm25 weights of the FTS5 columns title, description, tags and
+# ingredients, mirroring the A, C, B and B tsvector weights.
+FTS_WEIGHTS = '10.0, 1.0, 4.0, 4.0'
+
+
+def _documents(recipe_model, recipe_ids):
+    '''Return the searchable text of each recipe, keyed by id.'''
+    documents = {
+        recipe['id']: {**recipe, 'tags': [], 'ingredients': []}
+        for recipe in recipe_model.objects.filter(id__in=recipe_ids).values(
+            'id', 'title', 'description'
+        )
+    }
+    for field in ('tags', 'ingredients'):
+        relation = getattr(recipe_model, field)
+        target = relation.field.m2m_reverse_field_name()
+        names = defaultdict(list)
+        for recipe_id, name in relation.through.objects.filter(
+            recipe_id__in=documents
+        ).values_list('recipe_id', f'{target}__name'):
+            names[recipe_id].append(name)
+        for recipe_id, values in names.items():
+            documents[recipe_id][field] = values
+
+    return documents
+
+
+def update_search_index(recipe_ids, recipe_model=None):
+    '''Refresh the search documents of the recipes.'''
+    from .models import Recipe
+    recipe_model = recipe_model or Recipe
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    documents = _documents(recipe_model, recipe_ids)
+    if not documents:
+        return
+
+    if connection.vendor == 'postgresql':
+        rows = ', '.join(['(%s, %s, %s, %s)'] * len(documents))
+        params = [
+            value
+            for recipe_id, doc in documents.items()
+            for value in (
+                recipe_id,
+                doc['title'],
+                ' '.join(doc['tags'] + doc['ingredients']),
+                doc['description'],
+            )
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {recipe_model._meta.db_table} AS recipe '
+                'SET search_vector = '
+                "setweight(to_tsvector(%s::regconfig, doc.title), 'A') || "
+                "setweight(to_tsvector(%s::regconfig, doc.related), 'B') || "
+                "setweight(to_tsvector(%s::regconfig, doc.description), 'C') "
+                f'FROM (VALUES {rows}) '
+                'AS doc(id, title, related, description) '
+                'WHERE recipe.id = doc.id',
+                [SEARCH_CONFIG] * 3 + params,
+            )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} '
+                '(rowid, title, description, tags, ingredients) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [
+                    (
+                        recipe_id,
+                        doc['title'],
+                        doc['description'],
+                        ' '.join(doc['tags']),
+                        ' '.join(doc['ingredients']),
+                    )
+                    for recipe_id, doc in documents.items()
+                ],
+            )
+
+
+def remove_from_search_index(recipe_ids):
+    '''Drop the search documents of deleted recipes.'''
+    recipe_ids = list(recipe_ids)
+    if connection.vendor == 'sqlite' and recipe_ids:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(recipe_id,) for recipe_id in recipe_ids],
+            )
+
+
+def search_recipes(query_set, text):
+    '''Filter recipes matching text and annotate them with a `rank`.
+
+    Higher ranks are better matches.
+    '''
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            text, search_type='websearch', config=SEARCH_CONFIG
+        )
+        return query_set.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        )
+
+    # Quote every word so user input can't use the FTS5 query syntax.
+    terms = ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+    if not terms:
+        return query_set.none()
+
+    return query_set.annotate(
+        rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {FTS_WEIGHTS}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = core_recipe.id',
+            (terms,),
+            output_field=FloatField(),
+        )
+    ).filter(rank__isnull=False)
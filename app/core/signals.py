@@ -0,0 +1,119 @@
+'''
+Signal handlers for the core models.
+'''
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from .images import release_image
+from .models import Recipe, Tag, Ingredient
+from .search import remove_from_search_index, update_search_index
+from .versioning import bump_version
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_owner_version(sender, instance, **kwargs):
+    '''Bump the data version of the object's owner.'''
+    bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_relation_version(sender, instance, action, **kwargs):
+    '''Bump the data version when recipe relations change.'''
+    if action.startswith('post_'):
+        bump_version(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, raw=False, **kwargs):
+    '''Refresh the search document of a saved recipe.'''
+    if not raw:
+        update_search_index([instance.id])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    '''Drop the search document of a deleted recipe.'''
+    remove_from_search_index([instance.id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_relation_change(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    '''Refresh the search documents of recipes whose relations changed.'''
+    if not reverse:
+        if action.startswith('post_'):
+            update_search_index([instance.id])
+    elif action == 'pre_clear':
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        update_search_index(getattr(instance, '_search_recipe_ids', []))
+    elif action.startswith('post_'):
+        update_search_index(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def index_renamed_item(sender, instance, created, raw=False, **kwargs):
+    '''Refresh the search documents of recipes using a renamed item.'''
+    if not created and not raw:
+        update_search_index(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_item_recipes(sender, instance, **kwargs):
+    '''Remember the recipes of an item about to be deleted.'''
+    instance._search_recipe_ids = list(
+        instance.recipe_set.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def index_deleted_item(sender, instance, **kwargs):
+    '''Refresh the search documents of recipes that used a deleted item.'''
+    update_search_index(getattr(instance, '_search_recipe_ids', []))
+
+
+@receiver(post_save, sender=Recipe)
+def release_replaced_image(sender, instance, raw=False, update_fields=None,
+                           **kwargs):
+    '''Release the previous image file of a recipe once it's replaced.'''
+    if raw or 'image' not in instance.__dict__ or (
+        update_fields is not None and 'image' not in update_fields
+    ):
+        return
+
+    previous = getattr(instance, '_loaded_image', None)
+    current = instance.image.name
+    instance._loaded_image = current
+    if previous and previous != current:
+        transaction.on_commit(partial(release_image, previous))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_image(sender, instance, **kwargs):
+    '''Release the image file of a deleted recipe.'''
+    image = instance.__dict__.get('image')
+    name = getattr(image, 'name', image)
+    if name:
+        transaction.on_commit(partial(release_image, name))
@@ -0,0 +1,86 @@
+'''
+Content-addressed file storage.
+'''
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''Store files under the SHA-256 of their content.
+
+    A file saved as `<dir>/<name><ext>` is stored as
+    `<dir>/ab/cd/<digest><ext>`, the shard directories being the first
+    bytes of the digest, so no directory grows past a few thousand entries
+    and identical files are kept once. Saving never overwrites a different
+    file, releasing a name shared by several owners is up to the caller.
+    '''
+    def content_name(self, name, content):
+        '''Return the content-addressed name of content saved as name.'''
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name.replace('\\', '/')),
+            digest[:2],
+            digest[2:4],
+            f'{digest}{extension}',
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Mark the copy as reused, see core.images.release_image.
+            os.utime(self.path(name))
+            return name
+        return self.store(name, content)
+
+    def store(self, name, content):
+        '''Write content under exactly name, replacing any file there.
+
+        The file is written aside and renamed into place, so readers never
+        see a partial file.
+        '''
+        validate_file_name(name, allow_relative_path=True)
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    temp_file.write(chunk)
+            # mkstemp creates the file private to its owner.
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+recipe_image_storage = ContentAddressedStorage()
@@ -0,0 +1,44 @@
+'''
+Tests for the cache helpers.
+'''
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.caching import get_or_compute
+
+
+class GetOrComputeTests(SimpleTestCase):
+    '''Test single-flight cache fills.'''
+    def tearDown(self):
+        cache.clear()
+
+    def test_compute_and_store(self):
+        '''Test a missing value is computed once and cached.'''
+        compute = Mock(return_value='value')
+
+        self.assertEqual(get_or_compute(cache, 'key', compute, 60), 'value')
+        self.assertEqual(get_or_compute(cache, 'key', compute, 60), 'value')
+
+        compute.assert_called_once()
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_none_not_cached(self):
+        '''Test a None result is not cached.'''
+        compute = Mock(return_value=None)
+
+        get_or_compute(cache, 'key', compute, 60)
+        get_or_compute(cache, 'key', compute, 60)
+
+        self.assertEqual(compute.call_count, 2)
+
+    @patch('core.caching.time.sleep')
+    def test_wait_for_concurrent_fill(self, patched_sleep):
+        '''Test a caller waits for the lock holder instead of computing.'''
+        cache.add('key:lock', True)
+        patched_sleep.side_effect = lambda _: cache.set('key', 'filled')
+        compute = Mock(return_value='value')
+
+        self.assertEqual(get_or_compute(cache, 'key', compute, 60), 'filled')
+        compute.assert_not_called()
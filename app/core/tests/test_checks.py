@@ -0,0 +1,60 @@
+'''
+Tests for the system checks.
+'''
+from django.test import SimpleTestCase, override_settings
+
+from core.checks import check_shared_caches
+
+LOCMEM = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+REDIS = {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': 'redis://localhost:6379/0',
+}
+
+
+class SharedCachesCheckTests(SimpleTestCase):
+    '''Test caches shared by workers can't be local to a process.'''
+
+    @override_settings(CACHES={'default': LOCMEM},
+                       LOCAL_CACHES_ALLOWED=False)
+    def test_local_cache_refused(self):
+        '''Test a memory cache is an error outside a single process.'''
+        errors = check_shared_caches(None)
+
+        self.assertEqual({error.id for error in errors}, {'core.E001'})
+        messages = ' '.join(error.msg for error in errors)
+        self.assertIn('DATA_VERSION_CACHE', messages)
+        self.assertIn('API_RESPONSE_CACHE', messages)
+        self.assertIn('TOKEN_AUTH_CACHE', messages)
+        self.assertNotIn('REVOCATION_CACHE', messages)
+
+    @override_settings(CACHES={'default': REDIS},
+                       LOCAL_CACHES_ALLOWED=False,
+                       TOKEN_AUTH_CACHE={'SHARED_CACHE': None})
+    def test_token_cache_required(self):
+        '''Test token authentication results need a shared cache.'''
+        errors = check_shared_caches(None)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn('TOKEN_AUTH_CACHE', errors[0].msg)
+
+    @override_settings(CACHES={'default': LOCMEM},
+                       LOCAL_CACHES_ALLOWED=False,
+                       SIGNED_TOKENS={'ENABLED': True})
+    def test_local_revocation_cache_refused(self):
+        '''Test signed tokens need a shared revocation list.'''
+        messages = ' '.join(error.msg for error in check_shared_caches(None))
+
+        self.assertIn('REVOCATION_CACHE', messages)
+
+    @override_settings(CACHES={'default': LOCMEM},
+                       LOCAL_CACHES_ALLOWED=True)
+    def test_local_cache_allowed(self):
+        '''Test a memory cache is accepted for a single process.'''
+        self.assertEqual(check_shared_caches(None), [])
+
+    @override_settings(CACHES={'default': REDIS},
+                       LOCAL_CACHES_ALLOWED=False)
+    def test_shared_cache(self):
+        '''Test a shared backend passes.'''
+        self.assertEqual(check_shared_caches(None), [])
@@ -1,13 +1,27 @@
 '''
 Test Django management commands.
 '''
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
 
-from django.test import SimpleTestCase
-from django.core.management import call_command
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
 
+from core.images import get_storage
+from core.management.commands.import_recipes import (
+    Command as ImportCommand,
+)
+from core.models import ImportProgress, Recipe, Tag
+
 
 @patch('core.management.commands.wait_for_db.Command.check')
 class TestCommands(SimpleTestCase):
@@ -30,3 +44,293 @@ class TestCommands(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 7)
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkFiltersTests(TestCase):
+    '''Test the filter benchmark command.'''
+
+    def test_benchmark_filters_rolls_back(self):
+        '''Test the benchmark reports timings and leaves no data behind.'''
+        out = StringIO()
+
+        call_command('benchmark_filters', recipes=20, tags=8, repeat=1,
+                     stdout=out)
+
+        self.assertIn('recipes by tags', out.getvalue())
+        self.assertIn('assigned tags', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class BenchmarkRenderersTests(SimpleTestCase):
+    '''Test the JSON renderer benchmark command.'''
+
+    def test_benchmark_renderers(self):
+        '''Test both renderers are timed and produce the same output.'''
+        out = StringIO()
+
+        call_command('benchmark_renderers', recipes=5, repeat=1, stdout=out)
+
+        self.assertIn('list page: default', out.getvalue())
+        self.assertIn('streamed array: default', out.getvalue())
+        self.assertNotIn('OUTPUT DIFFERS', out.getvalue())
+
+
+class ExplainQueriesTests(TestCase):
+    '''Test the explain queries command.'''
+
+    def test_explain_queries(self):
+        '''Test a plan is printed for each API list query.'''
+        get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        out = StringIO()
+
+        call_command('explain_queries', stdout=out)
+
+        self.assertIn('recipes by all tags', out.getvalue())
+        self.assertIn('recipe_user_id_desc_idx', out.getvalue())
+        self.assertIn('tag_user_name_desc_idx', out.getvalue())
+
+    def test_explain_queries_without_user(self):
+        '''Test the command fails when there is no user.'''
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+
+class GcImagesTests(TestCase):
+    '''Test the orphaned image garbage collection command.'''
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = get_storage()
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        self.kept = self._file('uploads/recipe/aa/bb/kept.jpg')
+        Recipe.objects.create(user=user, title='Recipe', time_minute=5,
+                              price='5.00', image=self.kept)
+        self.kept_variant = self._file(f'{self.kept}.thumb.webp')
+        self.orphan = self._file('uploads/recipe/cc/dd/orphan.jpg')
+        self.orphan_variant = self._file(f'{self.orphan}.thumb.webp')
+
+    def _file(self, name, age=7200):
+        name = self.storage.store(name, ContentFile(b'image'))
+        past = time.time() - age
+        os.utime(self.storage.path(name), (past, past))
+        return name
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command('gc_images', *args, stdout=out)
+        return out.getvalue()
+
+    def test_gc_images_deletes_unreferenced_files(self):
+        '''Test unreferenced images and variants are deleted.'''
+        recent = self._file('uploads/recipe/ee/ff/recent.jpg', age=0)
+
+        out = self._run()
+
+        self.assertTrue(self.storage.exists(self.kept))
+        self.assertTrue(self.storage.exists(self.kept_variant))
+        self.assertTrue(self.storage.exists(recent))
+        self.assertFalse(self.storage.exists(self.orphan))
+        self.assertFalse(self.storage.exists(self.orphan_variant))
+        self.assertIn('Deleted 2 files, 10 bytes', out)
+
+    def test_gc_images_dry_run(self):
+        '''Test a dry run lists the files without deleting them.'''
+        out = self._run('--dry-run')
+
+        self.assertIn(f'Would delete {self.orphan}\n', out)
+        self.assertTrue(self.storage.exists(self.orphan))
+        self.assertTrue(self.storage.exists(self.orphan_variant))
+
+    def test_gc_images_resumes_from_checkpoint(self):
+        '''Test limited runs continue where the previous one stopped.'''
+        checkpoint = os.path.join(settings.MEDIA_ROOT, 'gc.checkpoint')
+        args = ('--checkpoint', checkpoint, '--max-files', '2',
+                '--batch-size', '1')
+
+        first = self._run(*args)
+
+        self.assertIn('Examined 2 files. Deleted 0 files', first)
+        self.assertTrue(self.storage.exists(self.orphan))
+
+        second = self._run(*args)
+
+        self.assertIn('Examined 2 files. Deleted 2 files', second)
+        self.assertFalse(self.storage.exists(self.orphan_variant))
+        self.assertFalse(os.path.exists(checkpoint))
+
+
+class ImportRecipesTests(TestCase):
+    '''Test the bulk recipe import command.'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def _file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as input_file:
+            input_file.write(content)
+        return path
+
+    def _run(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_recipes', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_ndjson(self):
+        '''Test NDJSON records are imported with their relations.'''
+        path = self._file('recipes.ndjson', (
+            '{"id": 7, "title": "Curry", "time_minute": 30, '
+            '"price": "5.5", "tags": ["vegan", "Spicy"], '
+            '"ingredients": ["Rice"]}\n'
+            '\n'
+            '{"title": "", "time_minute": 5, "price": "1.00"}\n'
+        ))
+
+        out, err = self._run(path, '--user', self.user.email)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Curry')
+        self.assertEqual(recipe.price, Decimal('5.50'))
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Spicy', 'Vegan'],
+        )
+        self.assertEqual(
+            list(recipe.ingredients.values_list('name', flat=True)),
+            ['Rice'],
+        )
+        self.assertIn('Record 2 skipped: title is required', err)
+        self.assertIn('rows/s', out)
+        self.assertIn('Imported 1 recipes, skipped 1.', out)
+
+    def test_import_csv_with_user_column(self):
+        '''Test CSV records are owned by the user of their row.'''
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='pass123'
+        )
+        path = self._file('recipes.csv', (
+            'user,title,time_minute,price,tags,ingredients\n'
+            'other@example.com,Soup,10,2.00,Vegan;Warm,Leek;Salt\n'
+        ))
+
+        self._run(path)
+
+        recipe = Recipe.objects.get(user=other)
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertEqual(recipe.ingredients.count(), 2)
+        self.assertFalse(Tag.objects.filter(user=other, id=self.tag.id))
+
+    def test_import_malformed_records_skipped(self):
+        '''Test records that don't decode to recipes are skipped.'''
+        path = self._file('recipes.ndjson', (
+            '{"title": "Soup", "time_minute": 5,\n'
+            '["not", "an", "object"]\n'
+            '{"title": "Stew", "time_minute": 5, "price": "1", "tags": 3}\n'
+            '{"title": "Pie", "time_minute": 5, "price": "1", "user": 5}\n'
+            '{"title": "Curry", "time_minute": 5, "price": "1"}\n'
+        ))
+
+        out, err = self._run(path, '--user', self.user.email)
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Curry']
+        )
+        self.assertIn('Record 1 skipped: not valid JSON.', err)
+        self.assertIn('Record 2 skipped: not a JSON object.', err)
+        self.assertIn('Record 3 skipped: Tag names must be a list', err)
+        self.assertIn('Record 4 skipped: user must be an email.', err)
+        self.assertIn('Imported 1 recipes, skipped 4.', out)
+
+    def test_import_unknown_record_user_skipped(self):
+        '''Test records of an unknown user are skipped.'''
+        path = self._file('recipes.csv', (
+            'user,title,time_minute,price\n'
+            'nobody@example.com,Soup,10,2.00\n'
+            'user@example.com,Stew,10,2.00\n'
+        ))
+
+        out, err = self._run(path)
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Stew']
+        )
+        self.assertIn(
+            'Record 1 skipped: unknown user nobody@example.com.', err
+        )
+
+    def test_import_unknown_user(self):
+        '''Test an unknown --user stops the import.'''
+        path = self._file('recipes.ndjson', (
+            '{"title": "Soup", "time_minute": 5, "price": "1.00"}\n'
+        ))
+
+        with self.assertRaises(CommandError):
+            self._run(path, '--user', 'nobody@example.com')
+
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        '''Test a rerun skips the records already imported.'''
+        path = self._file('recipes.ndjson', ''.join(
+            f'{{"title": "Recipe {n}", "time_minute": 5, "price": "1"}}\n'
+            for n in range(3)
+        ))
+        ImportProgress.objects.create(name='recipes', records=2)
+
+        self._run(path, '--user', self.user.email,
+                  '--checkpoint', 'recipes', '--batch-size', '2')
+
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)),
+            ['Recipe 2'],
+        )
+        self.assertEqual(
+            ImportProgress.objects.get(name='recipes').records, 3
+        )
+
+    def test_import_progress_committed_with_batch(self):
+        '''Test a failed batch rolls back with its progress, so a rerun
+        loads every record once.'''
+        path = self._file('recipes.ndjson', ''.join(
+            f'{{"title": "Recipe {n}", "time_minute": 5, "price": "1"}}\n'
+            for n in range(4)
+        ))
+        args = (path, '--user', self.user.email,
+                '--checkpoint', 'recipes', '--batch-size', '2')
+        load = ImportCommand._load_bulk
+        calls = []
+
+        def crash_second_batch(command, rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('Killed.')
+            return load(command, rows)
+
+        with patch.object(ImportCommand, '_load_bulk', crash_second_batch):
+            with self.assertRaises(RuntimeError):
+                self._run(*args)
+
+        self.assertEqual(
+            ImportProgress.objects.get(name='recipes').records, 2
+        )
+        self._run(*args)
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            [f'Recipe {n}' for n in range(4)],
+        )
@@ -0,0 +1,102 @@
+'''
+Tests for the compression of API responses.
+'''
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.compression import (
+    CompressionMiddleware,
+    accepts_gzip,
+    compress,
+    pad,
+)
+
+BODY = b'{"id":1,"name":"tag"},' * 200
+
+
+class CompressionTests(SimpleTestCase):
+    '''Test the gzip negotiation and encoding.'''
+
+    def _response(self, response, path='/api/recipe/', **headers):
+        request = RequestFactory().get(path, **headers)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_accepts_gzip(self):
+        '''Test Accept-Encoding values are negotiated with qualities.'''
+        self.assertTrue(accepts_gzip('gzip, deflate, br'))
+        self.assertTrue(accepts_gzip('br;q=1.0, gzip;q=0.5'))
+        self.assertTrue(accepts_gzip('*'))
+        self.assertFalse(accepts_gzip('gzip;q=0'))
+        self.assertFalse(accepts_gzip('*;q=0.5, gzip;q=0'))
+        self.assertFalse(accepts_gzip('br, identity'))
+        self.assertFalse(accepts_gzip(''))
+
+    def test_pad_keeps_content(self):
+        '''Test padded bodies decompress to the content.'''
+        compressed = compress(BODY)
+        padded = {pad(compressed) for _ in range(20)}
+
+        self.assertGreater(len({len(body) for body in padded}), 1)
+        for body in padded:
+            self.assertEqual(gzip.decompress(body), BODY)
+
+    def test_compress_response(self):
+        '''Test API responses are compressed for clients accepting gzip.'''
+        response = HttpResponse(BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+
+        response = self._response(response, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], '"abc"')
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_compressed_content_used(self):
+        '''Test a body compressed ahead of time is sent as is.'''
+        response = HttpResponse(BODY, content_type='application/json')
+        response.compressed_content = compress(b'precompressed')
+
+        response = self._response(response, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(gzip.decompress(response.content), b'precompressed')
+
+    def test_compress_stream(self):
+        '''Test streaming responses are compressed as they stream.'''
+        response = StreamingHttpResponse(iter([BODY, BODY]))
+
+        response = self._response(response, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            BODY * 2,
+        )
+
+    def test_not_compressed(self):
+        '''Test responses are left alone when gzip doesn't apply.'''
+        cases = (
+            ('/api/recipe/', BODY, {}),
+            ('/api/recipe/', b'{}', {'HTTP_ACCEPT_ENCODING': 'gzip'}),
+            ('/static/media/a.jpg', BODY, {'HTTP_ACCEPT_ENCODING': 'gzip'}),
+        )
+        for path, body, headers in cases:
+            response = self._response(HttpResponse(body), path, **headers)
+
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(response.content, body)
+
+    @override_settings(API_COMPRESSION={'MIN_BYTES': 10})
+    def test_encoded_response_not_compressed(self):
+        '''Test responses with a Content-Encoding are left alone.'''
+        response = HttpResponse(BODY)
+        response['Content-Encoding'] = 'br'
+
+        response = self._response(response, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response.content, BODY)
@@ -0,0 +1,166 @@
+'''
+Tests for recipe image variants.
+'''
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import images
+from core.models import Recipe
+
+
+def image_content(size=(100, 50)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, format='PNG')
+    return ContentFile(buffer.getvalue(), name='photo.png')
+
+
+@override_settings(IMAGE_VARIANTS={'ASYNC': False, 'SIZES': {'thumb': 20}})
+class ImageVariantTests(TestCase):
+    '''Test rendering image variants.'''
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=user,
+            title='Sample recipe',
+            time_minute=5,
+            price='5.00',
+            image=image_content(),
+        )
+        self.storage = images.get_storage()
+
+    def tearDown(self):
+        for recipe in Recipe.objects.exclude(image=''):
+            for name in recipe.image_variants.values():
+                self.storage.delete(name)
+            self.storage.delete(recipe.image.name)
+
+    def test_generate_variants(self):
+        '''Test variants are stored next to the original and recorded.'''
+        images.generate_variants(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        name = f'{self.recipe.image.name}.thumb.webp'
+        self.assertEqual(self.recipe.image_status, 'ready')
+        self.assertEqual(self.recipe.image_variants, {'thumb': name})
+        with self.storage.open(name) as variant_file:
+            with Image.open(variant_file) as img:
+                self.assertEqual(img.size, (20, 10))
+
+    @patch.object(images, 'RELEASE_GRACE', 0)
+    def test_generate_variants_for_replaced_image(self):
+        '''Test variants of an image replaced meanwhile are discarded.'''
+        source = self.recipe.image.name
+        render = images._render
+
+        def render_and_replace(image_file, name, options):
+            rendered = render(image_file, name, options)
+            Recipe.objects.filter(id=self.recipe.id).update(image='other')
+            return rendered
+
+        with patch.object(images, '_render', side_effect=render_and_replace):
+            images.generate_variants(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+        self.assertFalse(self.storage.exists(f'{source}.thumb.webp'))
+        self.assertFalse(self.storage.exists(source))
+
+    def test_generate_variants_reuses_shared_files(self):
+        '''Test a recipe sharing an image reuses its rendered variants.'''
+        images.generate_variants(self.recipe.id)
+        self.recipe.refresh_from_db()
+        other = Recipe.objects.create(
+            user=self.recipe.user,
+            title='Copy',
+            time_minute=5,
+            price='5.00',
+            image=image_content(),
+        )
+
+        with patch.object(images, '_render') as render:
+            images.generate_variants(other.id)
+
+        other.refresh_from_db()
+        render.assert_not_called()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(other.image_variants, self.recipe.image_variants)
+
+    @patch.object(images, 'RELEASE_GRACE', 0)
+    def test_release_shared_image(self):
+        '''Test a shared file is deleted with its last recipe only.'''
+        images.generate_variants(self.recipe.id)
+        self.recipe.refresh_from_db()
+        other = Recipe.objects.create(
+            user=self.recipe.user,
+            title='Copy',
+            time_minute=5,
+            price='5.00',
+            image=image_content(),
+        )
+        files = [other.image.name, *self.recipe.image_variants.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+
+        for name in files:
+            self.assertTrue(self.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+
+        for name in files:
+            self.assertFalse(self.storage.exists(name))
+
+    def test_release_recent_image_is_kept(self):
+        '''Test a file written moments ago is not released.'''
+        name = self.recipe.image.name
+        Recipe.objects.filter(id=self.recipe.id).update(image='')
+
+        images.release_image(name)
+
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+
+    def test_generate_variants_failure(self):
+        '''Test an unreadable image is reported as failed.'''
+        with self.storage.open(self.recipe.image.name, 'wb') as image_file:
+            image_file.write(b'not an image')
+
+        with self.assertLogs('core.images', 'ERROR'):
+            images.generate_variants(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'failed')
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_generate_image_variants_command(self):
+        '''Test the command renders variants of recipes without them.'''
+        out = StringIO()
+
+        call_command('generate_image_variants', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'ready')
+        self.assertIn('1 recipes', out.getvalue())
+
+    def test_generate_image_variants_command_all(self):
+        '''Test --all renders existing variants again at new sizes.'''
+        images.generate_variants(self.recipe.id)
+
+        with override_settings(IMAGE_VARIANTS={
+            'ASYNC': False, 'SIZES': {'thumb': 40},
+        }):
+            call_command('generate_image_variants', '--all', stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        with self.storage.open(self.recipe.image_variants['thumb']) as thumb:
+            self.assertEqual(Image.open(thumb).size, (40, 20))
@@ -1,4 +1,5 @@
 from decimal import Decimal
+from django.db import IntegrityError
 from django.test import TestCase
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
@@ -97,6 +98,73 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ing), ing.name)
 
+    def test_tag_name_unique_per_user(self):
+        '''Test a user can't have two tags with the same name.'''
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(
+            user=create_user('other@example.com'),
+            name='Vegan'
+        )
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
+    def test_tag_name_unique_ignoring_case(self):
+        '''Test a user can't have two tags differing only by case.'''
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='VEGAN')
+
+    def test_get_or_create_by_names(self):
+        '''Test fetching existing and creating missing named objects.'''
+        user = create_user()
+        salt = models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertNumQueries(4):
+            objects = models.Ingredient.objects.get_or_create_by_names(
+                user, ['Salt', 'Pepper', 'Lime', 'Pepper']
+            )
+
+        self.assertCountEqual(objects, ['Salt', 'Pepper', 'Lime'])
+        self.assertEqual(objects['Salt'], salt)
+        self.assertEqual(
+            models.Ingredient.objects.filter(user=user).count(), 3
+        )
+
+    def test_get_or_create_by_names_ignores_case(self):
+        '''Test names match existing objects regardless of case.'''
+        user = create_user()
+        salt = models.Ingredient.objects.create(user=user, name='Salt')
+
+        objects = models.Ingredient.objects.get_or_create_by_names(
+            user, ['salt', 'Pepper', 'PEPPER']
+        )
+
+        self.assertEqual(objects['salt'], salt)
+        self.assertEqual(objects['Pepper'], objects['PEPPER'])
+        self.assertEqual(objects['PEPPER'].name, 'Pepper')
+        self.assertEqual(
+            models.Ingredient.objects.filter(user=user).count(), 2
+        )
+
+    def test_get_or_create_by_names_non_ascii(self):
+        '''Test non-ASCII names are keyed as the database lowercases them.'''
+        user = create_user()
+
+        created = models.Tag.objects.get_or_create_by_names(
+            user, ['Épice', 'Crème']
+        )
+        objects = models.Tag.objects.get_or_create_by_names(
+            user, ['Épice', 'crème']
+        )
+
+        self.assertEqual(objects['Épice'], created['Épice'])
+        self.assertEqual(objects['crème'], created['Crème'])
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 2)
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         '''Test generating image path.'''
@@ -0,0 +1,61 @@
+'''
+Tests for the JSON renderer.
+'''
+import datetime
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from core.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    '''Test FastJSONRenderer matches the default renderer.'''
+
+    def assertSameOutput(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_render_api_types(self):
+        '''Test the types serializers produce render the same.'''
+        self.assertSameOutput(OrderedDict(
+            id=1,
+            price='10.80',
+            amount=Decimal('3.25'),
+            title='Crêpes\u2028and\u2029 "quoted" \\ </script>',
+            created=datetime.datetime(
+                2023, 5, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc
+            ),
+            day=datetime.date(2023, 5, 1),
+            at=datetime.time(8, 30),
+            key=uuid.UUID(int=1),
+            label=gettext_lazy('Name'),
+            empty=None,
+            flags=[True, False],
+            ratio=0.1,
+            tags=ReturnList([{'id': 2, 'name': 'Été'}], serializer=None),
+        ))
+
+    def test_render_falls_back(self):
+        '''Test indented output and huge integers use the default.'''
+        self.assertSameOutput({'id': 2 ** 70})
+        self.assertSameOutput(
+            {'id': 1, 'items': [1, 2]}, 'application/json; indent=4'
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_stream(self):
+        '''Test streaming an array renders it like a list.'''
+        renderer = FastJSONRenderer()
+        rows = [{'id': 1, 'price': Decimal('1.50')}, {'id': 2}]
+
+        self.assertEqual(b''.join(renderer.stream(iter(rows))),
+                         JSONRenderer().render(rows))
+        self.assertEqual(b''.join(renderer.stream(iter([]))), b'[]')
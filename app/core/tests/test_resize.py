@@ -0,0 +1,194 @@
+'''
+Tests for the image resize endpoint.
+'''
+import os
+import tempfile
+import threading
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core import resize
+from core.images import get_storage
+from core.models import Recipe
+
+
+def image_content(size=(1000, 500)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, format='JPEG')
+    return ContentFile(buffer.getvalue(), name='photo.jpg')
+
+
+class ResizeTestMixin:
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            IMAGE_RESIZE={'CACHE_DIR': self.cache_dir.name}
+        )
+        self.settings_override.enable()
+        size_patch = patch.object(resize, '_cache_size', None)
+        size_patch.start()
+        self.addCleanup(size_patch.stop)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.cache_dir.cleanup()
+
+
+class ResizeViewTests(ResizeTestMixin, TestCase):
+    '''Test serving resized renditions.'''
+
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=user,
+            title='Sample recipe',
+            time_minute=5,
+            price='5.00',
+            image=image_content(),
+        )
+        self.url = reverse('image-resize', args=[self.recipe.image.name])
+
+    def tearDown(self):
+        get_storage().delete(self.recipe.image.name)
+        super().tearDown()
+
+    def test_resize_image(self):
+        '''Test the rendition is rendered once then read from cache.'''
+        res = self.client.get(self.url, {'w': 320, 'fmt': 'webp'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+        with Image.open(BytesIO(b''.join(res.streaming_content))) as img:
+            self.assertEqual(img.size, (320, 160))
+
+        with patch.object(resize, '_render') as render:
+            cached = self.client.get(self.url, {'w': 320, 'fmt': 'webp'})
+            b''.join(cached.streaming_content)
+
+        render.assert_not_called()
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    def test_resize_image_not_modified(self):
+        '''Test a known rendition is answered with 304.'''
+        res = self.client.get(self.url, {'w': 320})
+
+        res = self.client.get(self.url, {'w': 320},
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, 304)
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_resize_not_modified_parses_etag_list(self):
+        '''Test If-None-Match is matched as a list of ETags.'''
+        etag = self.client.get(self.url, {'w': 320})['ETag']
+
+        listed = self.client.get(self.url, {'w': 320},
+                                 HTTP_IF_NONE_MATCH=f'"other", {etag}')
+        embedded = self.client.get(self.url, {'w': 320},
+                                   HTTP_IF_NONE_MATCH=f'"x{etag}x"')
+
+        self.assertEqual(listed.status_code, 304)
+        self.assertEqual(embedded.status_code, 200)
+
+    def test_resize_rounds_width_and_never_upscales(self):
+        '''Test widths round up to the step and stop at the original.'''
+        res = self.client.get(self.url, {'w': 300, 'fmt': 'png'})
+        with Image.open(BytesIO(b''.join(res.streaming_content))) as img:
+            self.assertEqual(img.format, 'PNG')
+            self.assertEqual(img.width, 304)
+
+        res = self.client.get(self.url, {'w': 2000, 'fmt': 'jpeg'})
+        with Image.open(BytesIO(b''.join(res.streaming_content))) as img:
+            self.assertEqual(img.width, 1000)
+
+    def test_resize_invalid_parameters(self):
+        '''Test invalid widths and formats are refused.'''
+        for params in ({}, {'w': 0}, {'w': 'wide'}, {'w': 99999},
+                       {'w': 100, 'fmt': 'tiff'}):
+            res = self.client.get(self.url, params)
+
+            self.assertEqual(res.status_code, 400)
+
+    def test_resize_unknown_image(self):
+        '''Test files that aren't a recipe image are not served.'''
+        storage = get_storage()
+        other = storage.store('uploads/recipe/other.jpg', image_content())
+
+        options = resize.get_resize_settings()
+        for name in ('uploads/recipe/missing.jpg', other):
+            key = resize.rendition_key(
+                name, 112, options['FORMATS']['webp'], options
+            )
+            res = self.client.get(
+                reverse('image-resize', args=[name]), {'w': 112},
+                HTTP_IF_NONE_MATCH=f'"{key}"',
+            )
+
+            self.assertEqual(res.status_code, 404)
+        storage.delete(other)
+
+
+class RenditionCacheTests(ResizeTestMixin, SimpleTestCase):
+    '''Test the rendition cache.'''
+
+    @patch.object(resize, '_is_recipe_image', return_value=True)
+    def test_concurrent_requests_render_once(self, patched_check):
+        '''Test concurrent requests for a rendition share one render.'''
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_render(*args):
+            started.set()
+            release.wait(5)
+            return b'rendition'
+
+        with patch.object(resize, '_render',
+                          side_effect=slow_render) as render:
+            threads = [
+                threading.Thread(
+                    target=lambda: resize.get_rendition(
+                        'a.jpg', 100, 'WEBP'
+                    ).close()
+                )
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            started.wait(5)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(render.call_count, 1)
+
+    @patch.object(resize, '_is_recipe_image', return_value=True)
+    def test_least_recently_used_renditions_evicted(self, patched_check):
+        '''Test the cache evicts the least recently used renditions.'''
+        options = {**resize.get_resize_settings(), 'MAX_BYTES': 35}
+        paths = {}
+        with patch.object(resize, '_render',
+                          return_value=b'x' * 10) as render:
+            for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+                resize.get_rendition(name, 100, 'WEBP', options).close()
+                key = resize.rendition_key(name, 100, 'WEBP', options)
+                paths[name] = resize.rendition_path(key, 'WEBP', options)
+                os.utime(paths[name], (1, len(paths)))
+            # Reading a marks it as recently used.
+            resize.get_rendition('a.jpg', 100, 'WEBP', options).close()
+            resize.get_rendition('d.jpg', 100, 'WEBP', options).close()
+
+        self.assertEqual(render.call_count, 4)
+        self.assertTrue(os.path.exists(paths['a.jpg']))
+        self.assertFalse(os.path.exists(paths['b.jpg']))
+        self.assertTrue(os.path.exists(paths['c.jpg']))
@@ -0,0 +1,86 @@
+'''
+Tests for the pre-built OpenAPI schema.
+'''
+import gzip
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.schema import clear_schema_cache
+
+SCHEMA_URL = reverse('api-schema')
+JSON_MEDIA_TYPE = 'application/vnd.oai.openapi+json'
+
+
+class SchemaTests(SimpleTestCase):
+    '''Test building and serving the schema.'''
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.artifact = os.path.join(self.tmpdir.name, 'schema.json')
+        settings_override = override_settings(SCHEMA_ARTIFACT=self.artifact)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(clear_schema_cache)
+        clear_schema_cache()
+
+    def test_build_schema_command(self):
+        '''Test the command writes the schema artifact.'''
+        call_command('build_schema', stdout=open(os.devnull, 'w'))
+
+        with open(self.artifact) as artifact:
+            schema = json.load(artifact)
+        self.assertIn('/api/recipe/recipes/', schema['paths'])
+        self.assertEqual(os.stat(self.artifact).st_mode & 0o777, 0o644)
+
+    def test_serve_schema_from_artifact(self):
+        '''Test the view serves the artifact.'''
+        with open(self.artifact, 'w') as artifact:
+            json.dump({'openapi': '3.0.3', 'paths': {}}, artifact)
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON_MEDIA_TYPE)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(res.content)['paths'], {})
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    def test_schema_generated_without_artifact(self):
+        '''Test the schema is generated when there is no artifact.'''
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT=JSON_MEDIA_TYPE)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('/api/recipe/recipes/', json.loads(res.content)['paths'])
+
+    def test_schema_not_modified(self):
+        '''Test a matching If-None-Match returns 304.'''
+        res = self.client.get(SCHEMA_URL)
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_schema_gzip_variant(self):
+        '''Test the gzip variant is served when accepted.'''
+        plain = self.client.get(SCHEMA_URL)
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+
+    def test_schema_gzip_refused(self):
+        '''Test the plain schema is served when gzip is refused.'''
+        res = self.client.get(
+            SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip;q=0, identity'
+        )
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertIn(b'openapi', res.content)
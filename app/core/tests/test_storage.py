@@ -0,0 +1,59 @@
+'''
+Tests for the content-addressed storage.
+'''
+import hashlib
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    '''Test files are stored by content.'''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = ContentAddressedStorage(location=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_names_file_by_content(self):
+        '''Test saved files are named by digest in shard directories.'''
+        digest = hashlib.sha256(b'content').hexdigest()
+
+        name = self.storage.save('uploads/a.JPG', ContentFile(b'content'))
+
+        self.assertEqual(
+            name,
+            f'uploads/{digest[:2]}/{digest[2:4]}/{digest}.jpg',
+        )
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'content')
+
+    def test_save_identical_content_once(self):
+        '''Test identical content is stored once under one name.'''
+        first = self.storage.save('uploads/a.png', ContentFile(b'same'))
+        second = self.storage.save('uploads/b.png', ContentFile(b'same'))
+        other = self.storage.save('uploads/c.png', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        directory = os.path.dirname(self.storage.path(first))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_store_replaces_exact_name(self):
+        '''Test store writes under the given name without a leftover.'''
+        self.storage.store('derived/a.webp', ContentFile(b'one'))
+        name = self.storage.store('derived/a.webp', ContentFile(b'two'))
+
+        self.assertEqual(name, 'derived/a.webp')
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'two')
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.storage.path(name))),
+            ['a.webp'],
+        )
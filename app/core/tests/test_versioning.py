@@ -0,0 +1,50 @@
+'''
+Tests for the per-user data versions.
+'''
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from core.models import Tag
+from core.versioning import bump_version, get_version
+
+
+class DataVersionTests(TransactionTestCase):
+    '''Test versions change once writes commit.'''
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_bump_outside_transaction(self):
+        '''Test a version is bumped right away without a transaction.'''
+        version = get_version(self.user.pk)
+
+        bump_version(self.user.pk)
+
+        self.assertNotEqual(get_version(self.user.pk), version)
+
+    def test_bump_deferred_until_commit(self):
+        '''Test a write in a transaction bumps the version on commit.'''
+        version = get_version(self.user.pk)
+
+        with transaction.atomic():
+            Tag.objects.create(user=self.user, name='Vegan')
+            self.assertEqual(get_version(self.user.pk), version)
+
+        self.assertNotEqual(get_version(self.user.pk), version)
+
+    def test_no_bump_on_rollback(self):
+        '''Test a rolled back write leaves the version unchanged.'''
+        version = get_version(self.user.pk)
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Tag.objects.create(user=self.user, name='Vegan')
+                raise RuntimeError
+
+        self.assertEqual(get_version(self.user.pk), version)
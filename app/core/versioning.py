@@ -0,0 +1,54 @@
+'''
+Per-user data versions.
+
+Every write to a user's recipes, tags, ingredients or their relations
+bumps the user's version, so a version identifies the state of all their
+API collections. Versions live in the DATA_VERSION_CACHE cache, which
+must be shared by all workers.
+
+Versions are bumped once the write commits. Bumped before, a concurrent
+read could still see the old rows and tag them with the new version.
+'''
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def _cache():
+    return caches[getattr(settings, 'DATA_VERSION_CACHE', 'default')]
+
+
+def _key(user_id):
+    return f'data-version:{user_id}'
+
+
+def get_version(user_id):
+    '''Return the current data version of the user.
+
+    Missing versions restart from the clock, so a version lost from the
+    cache is never handed out again.
+    '''
+    cache = _cache()
+    version = cache.get(_key(user_id))
+    if version is None:
+        cache.add(_key(user_id), time.time_ns(), None)
+        version = cache.get(_key(user_id))
+    return version
+
+
+def bump_version(user_id):
+    '''Mark the user's data as changed once the transaction commits.
+
+    Outside a transaction the version is bumped right away.
+    '''
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def _bump(user_id):
+    cache = _cache()
+    try:
+        cache.incr(_key(user_id))
+    except ValueError:
+        cache.set(_key(user_id), time.time_ns(), None)
@@ -0,0 +1,42 @@
+'''
+Query filters for recipe APIs.
+
+Relations are matched with correlated EXISTS subqueries on the through
+tables, so the filtered rows never fan out and need no DISTINCT.
+'''
+from django.db.models import Count, Exists, OuterRef
+
+from core.models import Recipe
+
+
+def filter_by_related(query_set, field, ids, match_all=False):
+    '''
+    Keep recipes linked through field to any of the ids, or to all of
+    them when match_all is set.
+    '''
+    relation = getattr(Recipe, field)
+    recipe_column = relation.field.m2m_column_name()
+    target_column = relation.field.m2m_reverse_name()
+    links = relation.through.objects.filter(**{f'{target_column}__in': ids})
+
+    if match_all:
+        # Relational division: a recipe qualifies when its links to the
+        # requested ids, grouped per recipe, cover every one of them.
+        matching = links.values(recipe_column).annotate(
+            matched=Count(target_column, distinct=True),
+        ).filter(matched=len(set(ids))).values(recipe_column)
+        return query_set.filter(pk__in=matching)
+
+    return query_set.filter(Exists(
+        links.filter(**{recipe_column: OuterRef('pk')})
+    ))
+
+
+def filter_assigned(query_set, field):
+    '''Keep tags or ingredients linked to a recipe through field.'''
+    relation = getattr(Recipe, field)
+    return query_set.filter(Exists(
+        relation.through.objects.filter(**{
+            relation.field.m2m_reverse_name(): OuterRef('pk'),
+        })
+    ))
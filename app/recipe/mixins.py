@@ -0,0 +1,225 @@
+'''
+View mixins for recipe APIs.
+'''
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from core.caching import get_or_compute
+from core.compression import compress, get_compression_settings
+from core.versioning import get_version
+
+
+class PreconditionResponse(Exception):
+    '''Carry a response that short-circuits the view.'''
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalMixin:
+    '''Answer conditional requests from the user's data version.
+
+    ETags are derived from the version, the URL and the media type, so
+    `If-None-Match` is answered with 304 and a stale `If-Match` with 412
+    before the queryset or the serializer runs.
+    '''
+    conditional_actions = ('list', 'retrieve', 'update', 'partial_update')
+
+    def get_etag(self, request):
+        '''Return the ETag of the requested representation.'''
+        key = ':'.join([
+            str(request.user.pk),
+            str(get_version(request.user.pk)),
+            request.get_full_path(),
+            request.accepted_renderer.media_type,
+        ])
+        return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+
+        if self.action in self.conditional_actions:
+            self.etag = self.get_etag(request)
+            response = get_conditional_response(request, etag=self.etag)
+            if response is not None:
+                if response.status_code == 304:
+                    response['ETag'] = self.etag
+                raise PreconditionResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, PreconditionResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(self, 'etag', None) and response.status_code == 200:
+            if request.method not in SAFE_METHODS:
+                # The write moved the version on.
+                self.etag = self.get_etag(request)
+            response['ETag'] = self.etag
+        return response
+
+
+class PrerenderedResponse(Response):
+    '''Response whose body was rendered, and maybe compressed, ahead of time.
+
+    See core.compression for the use of compressed_content.
+    '''
+    def __init__(self, content, content_type, data=None, compressed=None,
+                 **kwargs):
+        super().__init__(data=data, content_type=content_type, **kwargs)
+        self.prerendered_content = content
+        self.compressed_content = compressed
+
+    @property
+    def rendered_content(self):
+        self['Content-Type'] = self.content_type
+        return self.prerendered_content
+
+
+class CachedListMixin:
+    '''Cache the rendered body of list responses.
+
+    Keys include the user, the data version, the query parameters, the
+    media type, and the scheme and host the pagination links are built
+    from. Writes bump the version through signals, which retires
+    every cached list of the user at once. Bodies large enough to be
+    compressed are cached along with their compressed form.
+    '''
+    def get_list_cache_key(self, request):
+        '''Return the cache key of the requested list.'''
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        key = ':'.join([
+            type(self).__name__,
+            request.scheme,
+            request.get_host(),
+            str(request.user.pk),
+            str(get_version(request.user.pk)),
+            repr(params),
+            request.accepted_renderer.media_type,
+        ])
+        return f'api-list:{hashlib.sha1(key.encode()).hexdigest()}'
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if isinstance(renderer, BrowsableAPIRenderer):
+            return super().list(request, *args, **kwargs)
+
+        config = settings.API_RESPONSE_CACHE
+        response = None
+
+        def render():
+            nonlocal response
+            response = super(CachedListMixin, self).list(
+                request, *args, **kwargs
+            )
+            if response.status_code != 200:
+                return None
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type = f'{content_type}; charset={renderer.charset}'
+            body = renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context(),
+            )
+            options = get_compression_settings()
+            return {
+                'body': body,
+                'content_type': content_type,
+                'gzip': (
+                    compress(body, options)
+                    if len(body) >= options['MIN_BYTES'] else None
+                ),
+            }
+
+        cached = get_or_compute(
+            caches[config['CACHE']],
+            self.get_list_cache_key(request),
+            render,
+            config['TIMEOUT'],
+        )
+        if cached is None:
+            return response
+
+        return PrerenderedResponse(
+            cached['body'],
+            cached['content_type'],
+            # Only the request that rendered the body has its data.
+            data=response.data if response is not None else None,
+            compressed=cached.get('gzip'),
+        )
+
+
+class SparseFieldsMixin:
+    '''Shape read responses with the `fields` and `omit` parameters.
+
+    Both take comma separated serializer field names, `fields` keeping
+    only those and `omit` dropping them. The serializer loses the other
+    fields, and `sparse_only` defers the columns no requested field reads,
+    so the query shrinks along with the payload.
+    '''
+    sparse_actions = ('list', 'retrieve')
+
+    def _field_names(self, param):
+        value = self.request.query_params.get(param, '')
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    def get_sparse_fields(self):
+        '''Return the names of the requested fields, None for all.'''
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+
+        self._sparse_fields = None
+        fields = self._field_names('fields')
+        omit = self._field_names('omit')
+        if self.action in self.sparse_actions and (fields or omit):
+            available = list(self.get_serializer_class()().fields)
+            unknown = set(fields + omit) - set(available)
+            if unknown:
+                msg = _('Unknown fields: {names}.').format(
+                    names=', '.join(sorted(unknown))
+                )
+                raise serializers.ValidationError({'fields': [msg]})
+            self._sparse_fields = [
+                name for name in available
+                if (not fields or name in fields) and name not in omit
+            ]
+        return self._sparse_fields
+
+    def sparse_only(self, query_set):
+        '''Defer the model columns no requested field reads.'''
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return query_set
+
+        opts = query_set.model._meta
+        concrete = {field.name for field in opts.concrete_fields}
+        serializer_fields = self.get_serializer_class()().fields
+        sources = {serializer_fields[name].source for name in fields}
+        return query_set.only(opts.pk.name, *(sources & concrete))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in set(target.fields) - set(fields):
+                target.fields.pop(name)
+        return serializer
@@ -0,0 +1,22 @@
+'''
+Pagination for recipe APIs.
+'''
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''Keyset pagination over the recipe `-id` ordering.
+
+    Pages seek with `id < cursor` instead of an OFFSET, so deep pages cost
+    the same as the first one. Cursors are opaque to clients. Ranked search
+    results seek on their rank instead.
+    '''
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        if 'rank' in queryset.query.annotations:
+            return ('-rank', '-id')
+        return super().get_ordering(request, queryset, view)
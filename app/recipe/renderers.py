@@ -0,0 +1,61 @@
+'''
+Renderers for recipe exports.
+
+Besides rendering whole payloads, each renderer streams rows, dicts of
+scalars and lists, one encoded chunk at a time.
+'''
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class NDJSONRenderer(BaseRenderer):
+    '''Render one JSON document per line.'''
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        return b''.join(self.stream(rows))
+
+    def stream(self, rows, fields=None):
+        for row in rows:
+            yield json.dumps(
+                row,
+                cls=JSONEncoder,
+                ensure_ascii=False,
+                separators=(',', ':'),
+            ).encode(self.charset) + b'\n'
+
+
+class _Line:
+    '''File-like object handing back what csv.writer writes.'''
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(BaseRenderer):
+    '''Render rows as CSV with a header, list cells joined by `;`.'''
+    media_type = 'text/csv'
+    format = 'csv'
+    list_separator = ';'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        fields = list(rows[0]) if rows else []
+        return b''.join(self.stream(rows, fields))
+
+    def _cell(self, value):
+        if isinstance(value, (list, tuple)):
+            return self.list_separator.join(str(item) for item in value)
+        return value
+
+    def stream(self, rows, fields):
+        writer = csv.writer(_Line())
+        yield writer.writerow(fields).encode(self.charset)
+        for row in rows:
+            yield writer.writerow(
+                [self._cell(row.get(field)) for field in fields]
+            ).encode(self.charset)
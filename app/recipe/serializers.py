@@ -1,9 +1,72 @@
 '''
 Serializers for recipe APIs
 '''
+from decimal import ROUND_HALF_UP, Context, Decimal
+from operator import itemgetter
 
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.serializer_helpers import ReturnList
+from core.images import get_storage, schedule_variants
 from core.models import Recipe, Tag, Ingredient
+from core.search import update_search_index
+from core.versioning import bump_version
+
+RELATED_FIELDS = ('tags', 'ingredients')
+
+
+def _resolve_related(user, field, item_lists):
+    '''Return the ids of the user's objects named in each list of items.
+
+    Names from every list are fetched or created together in bulk.
+    '''
+    model = getattr(Recipe, field).field.related_model
+    related = model.objects.get_or_create_by_names(
+        user,
+        [item['name'] for items in item_lists for item in items],
+    )
+    return [
+        {related[item['name']].id for item in items}
+        for items in item_lists
+    ]
+
+
+def _link_related(field, wanted, replace=True):
+    '''Link each recipe id in wanted to exactly its set of related ids.
+
+    Only the through rows that change are deleted or inserted, each with a
+    single statement, so unchanged relations cause no writes. Without
+    replace the recipes are known to have no links yet and the current
+    rows are not read.
+    '''
+    relation = getattr(Recipe, field)
+    source = relation.field.m2m_column_name()
+    target = relation.field.m2m_reverse_name()
+    current = set()
+
+    if replace:
+        stale = []
+        links = relation.through.objects.filter(**{f'{source}__in': wanted})
+        for link_id, recipe_id, related_id in links.values_list(
+            'id', source, target
+        ):
+            if related_id in wanted[recipe_id]:
+                current.add((recipe_id, related_id))
+            else:
+                stale.append(link_id)
+        if stale:
+            relation.through.objects.filter(id__in=stale).delete()
+
+    relation.through.objects.bulk_create(
+        [
+            relation.through(**{source: recipe_id, target: related_id})
+            for recipe_id, related_ids in wanted.items()
+            for related_id in related_ids
+            if (recipe_id, related_id) not in current
+        ],
+        ignore_conflicts=True,
+    )
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -22,6 +85,66 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    '''Serializer for creating and updating recipes in bulk.'''
+    def _pop_related(self, validated_data):
+        '''Remove and return the related items of every recipe.'''
+        return {
+            field: [attrs.pop(field, None) for attrs in validated_data]
+            for field in RELATED_FIELDS
+        }
+
+    def _set_related(self, recipes, related, replace=True):
+        '''Link every recipe to its related items for the whole batch.'''
+        user = self.context['request'].user
+        for field, item_lists in related.items():
+            pairs = [
+                (recipe.id, items)
+                for recipe, items in zip(recipes, item_lists)
+                if items is not None
+            ]
+            related_ids = _resolve_related(
+                user, field, [items for _, items in pairs]
+            )
+            _link_related(
+                field,
+                {
+                    recipe_id: ids
+                    for (recipe_id, _), ids in zip(pairs, related_ids)
+                },
+                replace,
+            )
+
+    def create(self, validated_data):
+        '''Create recipes with a single insert.'''
+        related = self._pop_related(validated_data)
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(**attrs) for attrs in validated_data]
+        )
+        self._set_related(recipes, related, replace=False)
+        update_search_index(recipe.id for recipe in recipes)
+        bump_version(self.context['request'].user.pk)
+
+        return recipes
+
+    def update(self, instance, validated_data):
+        '''Update recipes with a single bulk update.'''
+        related = self._pop_related(validated_data)
+        fields = set()
+        for recipe, attrs in zip(instance, validated_data):
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+                fields.add(attr)
+
+        if fields:
+            Recipe.objects.bulk_update(instance, fields)
+        self._set_related(instance, related)
+        update_search_index(recipe.id for recipe in instance)
+        bump_version(self.context['request'].user.pk)
+
+        return instance
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     '''Serializer for recipe.'''
     tags = TagSerializer(many=True, required=False)
@@ -37,37 +160,29 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'tags',
                   'ingredients']
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
         # depth = 1
 
-    def _get_or_create_tag(self, tags, recipe):
-        '''Handle getting or creating tags.'''
-        user = self.context['request'].user
-        for tag_data in tags:
-            tag, _ = Tag.objects.get_or_create(
-                user=user,
-                **tag_data
-            )
-            recipe.tags.add(tag)
-
-    def _get_or_create_ingredient(self, ingredients, recipe):
-        '''Handle getting or creating ingredients.'''
-        user = self.context['request'].user
-        for ingredient_data in ingredients:
-            ingredient, _ = Ingredient.objects.get_or_create(
-                user=user,
-                **ingredient_data
-            )
-            recipe.ingredients.add(ingredient)
+    def _set_related(self, items, recipe, field, replace=True):
+        '''Link the recipe to the user's objects named in items.'''
+        related_ids, = _resolve_related(
+            self.context['request'].user, field, [items]
+        )
+        _link_related(field, {recipe.id: related_ids}, replace)
 
     def create(self, validated_data):
         '''Create a recipe.'''
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
 
-        recipe = Recipe.objects.create(**validated_data)
+        # Inserted without signals, like the relations, so the search
+        # document and version are refreshed once, after linking them.
+        recipe, = Recipe.objects.bulk_create([Recipe(**validated_data)])
 
-        self._get_or_create_tag(tags, recipe)
-        self._get_or_create_ingredient(ingredients, recipe)
+        self._set_related(tags, recipe, 'tags', replace=False)
+        self._set_related(ingredients, recipe, 'ingredients', replace=False)
+        update_search_index([recipe.id])
+        bump_version(recipe.user_id)
 
         return recipe
 
@@ -76,30 +191,173 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients', None)
 
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tag(tags, instance)
+            self._set_related(tags, instance, 'tags')
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredient(ingredients, instance)
+            self._set_related(ingredients, instance, 'ingredients')
 
         instance = super().update(instance, validated_data)
 
         return instance
 
 
+class RecipeRowSerializer:
+    '''Read-only, compiled form of RecipeSerializer for lists of recipes.
+
+    Works from `values()` rows of the recipes, with one grouped query per
+    requested relation for the whole list, and builds the output dicts
+    directly instead of going through the per-field `to_representation` of
+    DRF. The output is the same as `RecipeSerializer(many=True).data`,
+    restricted to fields when given.
+    '''
+    price_exponent = Decimal(1).scaleb(
+        -Recipe._meta.get_field('price').decimal_places
+    )
+    price_context = Context(
+        prec=Recipe._meta.get_field('price').max_digits,
+        rounding=ROUND_HALF_UP,
+    )
+
+    def __init__(self, instance=None, many=True, context=None, fields=None):
+        self.instance = instance
+        self.context = context or {}
+        self.fields = self.field_names(fields)
+
+    @staticmethod
+    def field_names(fields=None):
+        '''Return the output fields, in RecipeSerializer order.'''
+        return [
+            name for name in RecipeSerializer.Meta.fields
+            if fields is None or name in fields
+        ]
+
+    @classmethod
+    def columns(cls, fields=None):
+        '''Return the columns the rows need for fields.
+
+        The id is always read, relations are grouped by it.
+        '''
+        return ['id'] + [
+            name for name in cls.field_names(fields)
+            if name != 'id' and name not in RELATED_FIELDS
+        ]
+
+    @staticmethod
+    def related_rows(field, recipe_ids):
+        '''Return the `(id, name)` of the related objects by recipe id.
+
+        The query has the shape of the `tags` or `ingredients` prefetch,
+        so objects come in the same order.
+        '''
+        relation = getattr(Recipe, field).field
+        query_name = relation.related_query_name()
+        rows = relation.related_model.objects.filter(
+            **{f'{query_name}__in': recipe_ids}
+        ).values_list(query_name, 'id', 'name')
+        grouped = {}
+        for recipe_id, related_id, name in rows:
+            grouped.setdefault(recipe_id, []).append(
+                {'id': related_id, 'name': name}
+            )
+        return grouped
+
+    def _price(self, value):
+        '''Return value as DecimalField renders it.'''
+        value = value.quantize(
+            self.price_exponent, context=self.price_context
+        )
+        if api_settings.COERCE_DECIMAL_TO_STRING:
+            return '{:f}'.format(value)
+        return value
+
+    def _getters(self, related):
+        '''Return the function building each output field from a row.'''
+        getters = {
+            name: itemgetter(name) for name in self.columns(self.fields)
+        }
+        getters['price'] = lambda row: self._price(row['price'])
+        for field, grouped in related.items():
+            getters[field] = (
+                lambda row, grouped=grouped: grouped.get(row['id'], [])
+            )
+        return [(name, getters[name]) for name in self.fields]
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        ids = [row['id'] for row in rows]
+        related = {
+            field: self.related_rows(field, ids) if ids else {}
+            for field in RELATED_FIELDS if field in self.fields
+        }
+        getters = self._getters(related)
+        return [
+            {name: getter(row) for name, getter in getters}
+            for row in rows
+        ]
+
+    @property
+    def data(self):
+        if not hasattr(self, '_data'):
+            self._data = self.to_representation(self.instance or ())
+        return ReturnList(self._data, serializer=self)
+
+
+@extend_schema_field({
+    'type': 'object',
+    'additionalProperties': {'type': 'string', 'format': 'uri'},
+})
+class ImageVariantsField(serializers.ReadOnlyField):
+    '''Map each image variant to its URL, absolute with a request.'''
+    def to_representation(self, value):
+        storage = get_storage()
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in value.items():
+            url = storage.url(name)
+            urls[variant] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return urls
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     '''Serializer for a detailed recipe.'''
+    image_variants = ImageVariantsField()
+
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description',
+            'image',
+            'image_status',
+            'image_variants',
+        ]
         extra_kwargs = {'image': {'read_only': 'True'}}
 
 
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    '''Serializer for deleting recipes in bulk.'''
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+    )
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     '''Serializer for uploading images to recipes.'''
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_status']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
+
+    def update(self, instance, validated_data):
+        '''Replace the image and queue the generation of its variants.'''
+        validated_data.update(
+            image_status=Recipe.ImageStatus.PENDING,
+            image_variants={},
+        )
+        recipe = super().update(instance, validated_data)
+        schedule_variants(recipe)
+
+        return recipe
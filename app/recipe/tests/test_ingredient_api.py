@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 from rest_framework import status
@@ -42,6 +43,9 @@ class PrivateApiTests(TestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
+    def tearDown(self):
+        cache.clear()
+
     def test_list_ingredients_success(self):
         '''Test getting a list of ingredients.'''
         Ingredient.objects.create(user=self.user, name='Salt')
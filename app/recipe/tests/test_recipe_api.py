@@ -1,20 +1,34 @@
 '''Test recipe api endpoints.'''
 from decimal import Decimal
+from io import BytesIO
+import csv
+import gzip
+import io
+import json
 import tempfile
 import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from unittest.mock import patch
 
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
 
 from core.models import Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.views import RecipeViewSet
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def detail_url(id):
@@ -67,6 +81,9 @@ class PrivateRecipeApiTests(TestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
+    def tearDown(self):
+        cache.clear()
+
     def test_retrieve_recipes(self):
         '''Test retrieving a list of recipes.'''
         create_recipe(user=self.user)
@@ -76,7 +93,32 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_matches_recipe_serializer(self):
+        '''Test the compiled list output renders like RecipeSerializer.'''
+        for i in range(3):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}',
+                                   price=Decimal(f'{i}.5'))
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}'),
+                Tag.objects.create(user=self.user, name=f'Été {i}'),
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ing {i}')
+            )
+        create_recipe(user=self.user, link='')
+        recipes = Recipe.objects.prefetch_related(
+            'tags', 'ingredients'
+        ).order_by('-id')
+        expected = JSONRenderer().render(
+            RecipeSerializer(recipes, many=True).data
+        )
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/json')
+
+        self.assertIn(b'"results":' + expected, res.content)
+        self.assertIn(b'"price":"1.50"', res.content)
 
     def test_retrieve_recipe_list_limited_to_user(self):
         '''Test the list of recipes that are limited to authenticated user.'''
@@ -91,7 +133,7 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_detail(self):
         '''Test getting a specific recipe's detail.'''
@@ -119,6 +161,28 @@ class PrivateRecipeApiTests(TestCase):
             self.assertEqual(getattr(recipe, k), v)
         self.assertEqual(recipe.user, self.user)
 
+    def test_create_recipe_refreshed_once(self):
+        '''Test a created recipe is indexed and versioned once.'''
+        payload = {
+            'title': 'Curry',
+            'time_minute': 10,
+            'price': Decimal('10.80'),
+            'tags': [{'name': 'Vegan'}],
+        }
+
+        with patch('core.versioning._bump') as bump, \
+                CaptureQueriesContext(connection) as ctx, \
+                self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        index_writes = [
+            query['sql'] for query in ctx.captured_queries
+            if 'INSERT OR REPLACE INTO core_recipe_fts' in query['sql']
+        ]
+        self.assertEqual(len(index_writes), 1)
+        self.assertEqual(bump.call_count, 1)
+
     def test_partial_update_recipe(self):
         '''Test partial update for a recipe.'''
         original_link = 'http://example.com/'
@@ -267,6 +331,45 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(Tag.objects.filter(name=tag_1.name).count(), 1)
         self.assertEqual(Tag.objects.filter(name=tag_2.name).count(), 1)
 
+    def test_create_recipe_with_repeated_tags(self):
+        '''Test repeated tag names in a payload link a single tag.'''
+        payload = {
+            'title': 'Test Recipe Title',
+            'time_minute': 10,
+            'price': Decimal('10.80'),
+            'tags': [{'name': 'Cake'}, {'name': 'Cake'}],
+        }
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_create_recipe_query_count_independent_of_items(self):
+        '''Test creating a recipe runs the same queries for any items.'''
+        def payload(count):
+            return {
+                'title': 'Test Recipe Title',
+                'time_minute': 10,
+                'price': Decimal('10.80'),
+                'tags': [{'name': f'Tag {i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'Ingredient {i}'} for i in range(count)
+                ],
+            }
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(RECIPE_URL, payload(1), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(RECIPE_URL, payload(30), format='json')
+
+        self.assertEqual(
+            len(large.captured_queries),
+            len(small.captured_queries)
+        )
+
     def test_create_tag_on_update_recipe(self):
         '''Test creating tags on updating a recipe.'''
         recipe = create_recipe(user=self.user)
@@ -296,6 +399,49 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(tag_vegan, recipe.tags.all())
         self.assertNotIn(tag_meat, recipe.tags.all())
 
+    def test_update_recipe_unchanged_tags_no_writes(self):
+        '''Test sending a recipe's current tags writes nothing.'''
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Meat'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+        payload = {
+            'tags': [{'name': 'Meat'}],
+            'ingredients': [{'name': 'Salt'}],
+        }
+
+        url = detail_url(recipe.id)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        writes = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith(('INSERT', 'DELETE'))
+        ]
+        self.assertEqual(writes, [])
+
+    def test_update_recipe_tags_diff(self):
+        '''Test updating tags only touches the changed through rows.'''
+        keep = Tag.objects.create(user=self.user, name='Keep')
+        drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(keep, drop)
+        kept_link = Recipe.tags.through.objects.get(recipe=recipe, tag=keep)
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'New'}]}
+
+        url = detail_url(recipe.id)
+        res = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            recipe.tags.values_list('name', flat=True), ['Keep', 'New']
+        )
+        self.assertTrue(
+            Recipe.tags.through.objects.filter(id=kept_link.id).exists()
+        )
+
     def test_clear_recipe_tags(self):
         '''Test clearing a recipe's tags.'''
         tag_american = Tag.objects.create(user=self.user, name='American')
@@ -423,9 +569,9 @@ class PrivateRecipeApiTests(TestCase):
         s3 = RecipeSerializer(r3)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_recipe_by_ingredients(self):
         '''Test filtering recipes by their ingredients.'''
@@ -445,9 +591,638 @@ class PrivateRecipeApiTests(TestCase):
         s3 = RecipeSerializer(r3)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_recipe_matching_all_tags(self):
+        '''Test match=all keeps only recipes carrying every tag.'''
+        r1 = create_recipe(user=self.user, title='Sea Vegetable')
+        r2 = create_recipe(user=self.user, title='Ocean Lobster')
+        t1 = Tag.objects.create(user=self.user, name='Vegan')
+        t2 = Tag.objects.create(user=self.user, name='Sea Food')
+        t3 = Tag.objects.create(user=self.user, name='Dinner')
+        r1.tags.add(t1, t2, t3)
+        r2.tags.add(t2, t3)
+
+        params = {'tags': f'{t1.id},{t2.id},{t1.id}', 'match': 'all'}
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']], [r1.id])
+
+    def test_filter_matching_all_combines_filters(self):
+        '''Test match=all applies to tags and ingredients together.'''
+        r1 = create_recipe(user=self.user, title='Pasta')
+        r2 = create_recipe(user=self.user, title='Steak')
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        ing1 = Ingredient.objects.create(user=self.user, name='Salt')
+        ing2 = Ingredient.objects.create(user=self.user, name='Pepper')
+        r1.tags.add(tag)
+        r1.ingredients.add(ing1, ing2)
+        r2.ingredients.add(ing1, ing2)
+
+        params = {
+            'tags': f'{tag.id}',
+            'ingredients': f'{ing1.id},{ing2.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']], [r1.id])
+
+    def test_filter_invalid_match_mode(self):
+        '''Test an unknown match mode is rejected.'''
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_recipes_paginated_by_cursor(self):
+        '''Test recipes are paged by an opaque cursor in -id order.'''
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[4].id, recipes[3].id]
+        )
+        self.assertIsNone(res.data['previous'])
+        self.assertIn('cursor=', res.data['next'])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[2].id, recipes[1].id]
+        )
+        self.assertIsNotNone(res.data['previous'])
+
+    def test_paginate_filtered_recipes(self):
+        '''Test cursor pagination combined with the tags filter.'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tagged = []
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Untagged {i}')
+            recipe = create_recipe(user=self.user, title=f'Tagged {i}')
+            recipe.tags.add(tag)
+            tagged.append(recipe.id)
+
+        params = {'tags': str(tag.id), 'page_size': 2}
+        res = self.client.get(RECIPE_URL, params)
+        ids = [r['id'] for r in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(ids, sorted(tagged, reverse=True))
+        self.assertIsNone(res.data['next'])
+
+    def test_search_recipes(self):
+        '''Test searching titles, descriptions, tags and ingredients.'''
+        r1 = create_recipe(user=self.user, title='Tomato soup')
+        r2 = create_recipe(
+            user=self.user,
+            title='Pasta',
+            description='Cooked with tomato sauce'
+        )
+        r3 = create_recipe(user=self.user, title='Salad')
+        r3.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Tomatoes')
+        )
+        r4 = create_recipe(user=self.user, title='Steak')
+        other_user = get_user_model().objects.create_user(
+            email='otheruser@example.com',
+            password='otherpass123'
+        )
+        create_recipe(user=other_user, title='Tomato pie')
+
+        res = self.client.get(RECIPE_URL, {'search': 'tomato'})
+
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(ids, [r1.id, r2.id, r3.id])
+        self.assertEqual(ids[0], r1.id)
+        self.assertNotIn(r4.id, ids)
+
+    def test_search_follows_relation_changes(self):
+        '''Test search sees tags added after the recipe was saved.'''
+        recipe = create_recipe(user=self.user, title='Pasta')
+        tag = Tag.objects.create(user=self.user, name='Italian')
+        recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL, {'search': 'italian'})
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipe.id]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Comfort'
+            tag.save()
+        res = self.client.get(RECIPE_URL, {'search': 'italian'})
+        self.assertEqual(res.data['results'], [])
+
+    def test_search_paginated_by_rank(self):
+        '''Test search results page through every match once.'''
+        ids = {
+            create_recipe(
+                user=self.user,
+                title='Soup ' * (i % 3 + 1),
+                description=f'Recipe {i}'
+            ).id
+            for i in range(7)
+        }
+        res = self.client.get(RECIPE_URL, {'search': 'soup', 'page_size': 3})
+        found = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            found += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(len(found), 7)
+        self.assertEqual(set(found), ids)
+
+    def _count_queries(self, url):
+        '''Return the number of queries a GET on the url runs.'''
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_independent_of_size(self):
+        '''Test listing recipes runs the same queries for any page size.'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ing = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ing)
+        expected = self._count_queries(RECIPE_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+                recipe.tags.add(tag)
+                recipe.ingredients.add(ing)
+
+        self.assertEqual(self._count_queries(RECIPE_URL), expected)
+
+    def test_detail_query_count_independent_of_relations(self):
+        '''Test a recipe detail runs the same queries for any relations.'''
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        expected = self._count_queries(detail_url(recipe.id))
+
+        for i in range(5):
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'T{i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'I{i}')
+            )
+
+        self.assertEqual(self._count_queries(detail_url(recipe.id)), expected)
+
+    def _sparse_get(self, url, params):
+        '''Return the response of a GET and the SQL of its queries.'''
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+
+        return res, ' '.join(query['sql'] for query in ctx.captured_queries)
+
+    def test_list_sparse_fields(self):
+        '''Test listing only some fields reads only their columns.'''
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res, sql = self._sparse_get(
+            RECIPE_URL, {'fields': 'time_minute,id,title'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{
+            'id': recipe.id,
+            'title': recipe.title,
+            'time_minute': recipe.time_minute,
+        }])
+        self.assertNotIn('"price"', sql)
+        self.assertNotIn('core_tag', sql)
+
+    def test_list_omit_fields(self):
+        '''Test omitted relations are not queried.'''
+        create_recipe(user=self.user)
+
+        res, sql = self._sparse_get(RECIPE_URL, {'omit': 'tags,ingredients'})
+
+        self.assertEqual(
+            list(res.data['results'][0]),
+            ['id', 'title', 'time_minute', 'price', 'link'],
+        )
+        self.assertNotIn('core_tag', sql)
+        self.assertNotIn('core_ingredient', sql)
+
+    def test_detail_sparse_fields(self):
+        '''Test a detail with only some fields defers the other columns.'''
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt')
+        )
+
+        res, sql = self._sparse_get(
+            detail_url(recipe.id), {'fields': 'id,description,ingredients'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'id': recipe.id,
+            'description': recipe.description,
+            'ingredients': [{'id': recipe.ingredients.get().id,
+                             'name': 'Salt'}],
+        })
+        self.assertNotIn('"link"', sql)
+        self.assertNotIn('core_tag', sql)
+
+    def test_sparse_fields_unknown_field(self):
+        '''Test requesting an unknown field is rejected.'''
+        res = self.client.get(RECIPE_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', str(res.data['fields']))
+
+
+class BulkRecipeApiTests(TestCase):
+    '''Test bulk create, update and delete of recipes.'''
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_bulk_create_recipes(self):
+        '''Test creating a list of recipes with shared tags.'''
+        Tag.objects.create(user=self.user, name='Vegan')
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minute': 10,
+                'price': '5.50',
+                'tags': [{'name': 'Vegan'}, {'name': f'Tag {i}'}],
+                'ingredients': [{'name': 'Salt'}],
+            }
+            for i in range(3)
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [r['title'] for r in res.data],
+            ['Recipe 0', 'Recipe 1', 'Recipe 2']
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        for recipe in Recipe.objects.filter(user=self.user):
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 1)
+
+    def test_bulk_create_query_count_independent_of_size(self):
+        '''Test a bulk create runs the same queries for any batch size.'''
+        def payload(count):
+            return [
+                {
+                    'title': f'Recipe {i}',
+                    'time_minute': 10,
+                    'price': '5.50',
+                    'tags': [{'name': f'Tag {i}'}],
+                }
+                for i in range(count)
+            ]
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(BULK_URL, payload(1), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(BULK_URL, payload(20), format='json')
+
+        self.assertEqual(
+            len(large.captured_queries),
+            len(small.captured_queries)
+        )
+
+    def test_bulk_create_reports_item_errors(self):
+        '''Test invalid items are reported and nothing is created.'''
+        payload = [
+            {'title': 'Valid', 'time_minute': 10, 'price': '5.50'},
+            {'title': 'Invalid', 'price': '5.50'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minute', res.data[1])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_update_recipes(self):
+        '''Test partially updating a list of recipes.'''
+        r1 = create_recipe(user=self.user, title='First')
+        r2 = create_recipe(user=self.user, title='Second')
+        r2.tags.add(Tag.objects.create(user=self.user, name='Old'))
+        payload = [
+            {'id': r1.id, 'title': 'Updated'},
+            {'id': r2.id, 'tags': [{'name': 'New'}]},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        r1.refresh_from_db()
+        r2.refresh_from_db()
+        self.assertEqual(r1.title, 'Updated')
+        self.assertEqual(r2.title, 'Second')
+        self.assertEqual(
+            list(r2.tags.values_list('name', flat=True)), ['New']
+        )
+
+    def test_bulk_update_other_user_recipe_error(self):
+        '''Test bulk updating another user's recipe is rejected.'''
+        other_user = get_user_model().objects.create_user(
+            email='otheruser@example.com',
+            password='otherpass123'
+        )
+        mine = create_recipe(user=self.user, title='Mine')
+        theirs = create_recipe(user=other_user, title='Theirs')
+        payload = [
+            {'id': mine.id, 'title': 'Updated'},
+            {'id': theirs.id, 'title': 'Updated'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.title, 'Theirs')
+
+    def test_bulk_delete_recipes(self):
+        '''Test deleting a list of recipes.'''
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        r3 = create_recipe(user=self.user)
+
+        res = self.client.delete(
+            BULK_URL, {'ids': [r1.id, r2.id]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True)), [r3.id]
+        )
+
+    def test_bulk_delete_other_user_recipe_error(self):
+        '''Test bulk deleting another user's recipe deletes nothing.'''
+        other_user = get_user_model().objects.create_user(
+            email='otheruser@example.com',
+            password='otherpass123'
+        )
+        mine = create_recipe(user=self.user)
+        theirs = create_recipe(user=other_user)
+
+        res = self.client.delete(
+            BULK_URL, {'ids': [mine.id, theirs.id]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+
+class ConditionalRecipeApiTests(TransactionTestCase):
+    '''Test conditional requests on recipes, versions bump on commit.'''
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_list_not_modified(self):
+        '''Test an unchanged list is answered with 304 without queries.'''
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_list_modified_after_write(self):
+        '''Test recipe and relation writes change the ETag.'''
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Tag'))
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_served_from_cache(self):
+        '''Test a repeated list is served from the cache until a write.'''
+        first = self.client.get(RECIPE_URL, {'page_size': 10})
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL, {'page_size': 10})
+
+        self.assertEqual(second.content, first.content)
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'New'})
+        third = self.client.get(RECIPE_URL, {'page_size': 10})
+
+        self.assertEqual(third.data['results'][0]['title'], 'New')
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_list_cached_per_host(self):
+        '''Test cached pagination links keep the host of the request.'''
+        create_recipe(user=self.user)
+        params = {'page_size': 1}
+
+        first = self.client.get(RECIPE_URL, params, HTTP_HOST='a.example.com')
+        second = self.client.get(RECIPE_URL, params,
+                                 HTTP_HOST='b.example.com', secure=True)
+
+        self.assertTrue(
+            first.json()['next'].startswith('http://a.example.com/')
+        )
+        self.assertTrue(
+            second.json()['next'].startswith('https://b.example.com/')
+        )
+
+    def test_list_compressed_once_per_cache_fill(self):
+        '''Test cached lists are served with their stored gzip body.'''
+        for i in range(20):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+        first = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        with patch('core.compression.compress') as compress:
+            second = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        compress.assert_not_called()
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(second.content),
+                         gzip.decompress(first.content))
+        plain = self.client.get(RECIPE_URL)
+        self.assertEqual(gzip.decompress(second.content), plain.content)
+
+    def test_detail_not_modified(self):
+        '''Test an unchanged recipe detail is answered with 304.'''
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_update_with_stale_etag_rejected(self):
+        '''Test a PATCH with an outdated If-Match fails.'''
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        self.client.patch(url, {'title': 'First'}, HTTP_IF_MATCH=etag)
+
+        res = self.client.patch(url, {'title': 'Second'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'First')
+
+    def test_update_with_current_etag(self):
+        '''Test a PATCH with the current If-Match succeeds.'''
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.patch(url, {'title': 'New'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(self.client.get(url)['ETag'], res['ETag'])
+
+
+class ExportRecipeApiTests(TestCase):
+    '''Test streaming exports of recipes.'''
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _content(self, res):
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        '''Test recipes stream as one JSON document per line.'''
+        r1 = create_recipe(user=self.user, title='Crêpes')
+        r1.tags.add(Tag.objects.create(user=self.user, name='Sweet'))
+        r2 = create_recipe(user=self.user, title='Soup')
+        r2.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Leek')
+        )
+        create_recipe(user=get_user_model().objects.create_user(
+            'other@example.com', 'testpass123'
+        ))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertTrue(
+            res['Content-Type'].startswith('application/x-ndjson')
+        )
+        self.assertIn('recipes.ndjson', res['Content-Disposition'])
+        rows = [json.loads(line)
+                for line in self._content(res).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [r2.id, r1.id])
+        self.assertEqual(rows[0]['ingredients'], ['Leek'])
+        self.assertEqual(rows[1]['title'], 'Crêpes')
+        self.assertEqual(rows[1]['price'], '10.80')
+        self.assertEqual(rows[1]['tags'], ['Sweet'])
+
+    def test_export_csv(self):
+        '''Test recipes stream as CSV with joined relation names.'''
+        recipe = create_recipe(user=self.user, title='Pasta, fresh')
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Flour'),
+            Ingredient.objects.create(user=self.user, name='Egg'),
+        )
+
+        res = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('recipes.csv', res['Content-Disposition'])
+        reader = csv.DictReader(io.StringIO(self._content(res)))
+        row, = reader
+
+        self.assertEqual(reader.fieldnames[:2], ['id', 'title'])
+        self.assertEqual(row['title'], 'Pasta, fresh')
+        self.assertCountEqual(row['ingredients'].split(';'),
+                              ['Flour', 'Egg'])
+
+    def test_export_json(self):
+        '''Test recipes stream as a single JSON array.'''
+        recipes = [create_recipe(user=self.user, title=f'Recipe {i}')
+                   for i in range(3)]
+
+        res = self.client.get(EXPORT_URL, {'format': 'json'})
+
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertIn('recipes.json', res['Content-Disposition'])
+        rows = json.loads(self._content(res))
+        self.assertEqual([row['id'] for row in rows],
+                         [recipe.id for recipe in reversed(recipes)])
+
+    def test_export_compressed_stream(self):
+        '''Test exports are compressed as they stream.'''
+        for i in range(20):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(
+            b''.join(res.streaming_content)
+        ).splitlines()
+        self.assertEqual(len(lines), 20)
+
+    def test_export_prefetches_per_chunk(self):
+        '''Test relations are fetched once per chunk of recipes.'''
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}').tags.add(tag)
+
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL)
+            with CaptureQueriesContext(connection) as queries:
+                lines = self._content(res).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        # One recipe query, then tags and ingredients for each chunk.
+        self.assertEqual(len(queries), 1 + 3 * 2)
 
 
 class ImageUploadTests(TestCase):
@@ -462,8 +1237,25 @@ class ImageUploadTests(TestCase):
         self.recipe = create_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        for name in self.recipe.image_variants.values():
+            self.recipe.image.storage.delete(name)
         self.recipe.image.delete()
 
+    def _upload(self, size=(10, 10), color='red'):
+        '''Upload a JPEG of size and run the on commit callbacks.'''
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', size, color).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    image_upload_url(self.recipe.id),
+                    {'image': image_file},
+                    format='multipart',
+                )
+        self.recipe.refresh_from_db()
+        return res
+
     def test_upload_image(self):
         '''Test uploading an image for a recipe.'''
         image_url = image_upload_url(self.recipe.id)
@@ -487,3 +1279,110 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _post_file(self, content, name='photo.jpg'):
+        '''Post raw bytes as the image file.'''
+        image_file = SimpleUploadedFile(name, content)
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': image_file},
+            format='multipart',
+        )
+
+    def test_upload_unsupported_format(self):
+        '''Test files that aren't a supported image format are refused.'''
+        res = self._post_file(b'<svg xmlns="http://www.w3.org/2000/svg"/>')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(IMAGE_UPLOADS={'MAX_BYTES': 1024})
+    def test_upload_image_too_large(self):
+        '''Test uploads above the byte limit are refused.'''
+        buffer = BytesIO()
+        Image.effect_noise((100, 100), 64).save(buffer, format='PNG')
+
+        res = self._post_file(buffer.getvalue(), name='photo.png')
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    @override_settings(IMAGE_UPLOADS={'MAX_PIXELS': 100 * 100})
+    def test_upload_image_too_many_pixels(self):
+        '''Test images above the pixel limit are refused.'''
+        buffer = BytesIO()
+        Image.new('RGB', (200, 100)).save(buffer, format='JPEG')
+
+        res = self._post_file(buffer.getvalue())
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pixels', str(res.data['detail']))
+
+    @override_settings(IMAGE_VARIANTS={'ASYNC': False})
+    def test_upload_image_generates_variants(self):
+        '''Test resized variants are rendered once the upload commits.'''
+        res = self._upload(size=(2000, 1000))
+
+        self.assertEqual(res.data['image_status'], 'pending')
+        self.assertEqual(self.recipe.image_status, 'ready')
+        variants = self.recipe.image_variants
+        self.assertCountEqual(variants, ['thumb', 'card', 'full'])
+        storage = self.recipe.image.storage
+        for variant, side in (('thumb', 160), ('card', 640), ('full', 1600)):
+            self.assertEqual(
+                variants[variant],
+                f'{self.recipe.image.name}.{variant}.webp',
+            )
+            with storage.open(variants[variant]) as variant_file:
+                with Image.open(variant_file) as img:
+                    self.assertEqual(img.format, 'WEBP')
+                    self.assertEqual(img.size, (side, side // 2))
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.data['image_status'], 'ready')
+        self.assertEqual(
+            res.data['image_variants']['thumb'],
+            'http://testserver' + storage.url(variants['thumb']),
+        )
+
+    @override_settings(IMAGE_VARIANTS={'ASYNC': False})
+    @patch('core.images.RELEASE_GRACE', 0)
+    def test_replace_image_releases_old_file(self):
+        '''Test replacing an image deletes the old file and variants.'''
+        self._upload()
+        old_files = [self.recipe.image.name]
+        old_files += self.recipe.image_variants.values()
+
+        self._upload(color='blue')
+
+        storage = self.recipe.image.storage
+        self.assertNotEqual(self.recipe.image.name, old_files[0])
+        for name in old_files:
+            self.assertFalse(storage.exists(name))
+
+    @override_settings(IMAGE_VARIANTS={'ASYNC': False})
+    def test_upload_identical_images_share_file(self):
+        '''Test identical uploads are stored once, named by content.'''
+        self._upload()
+        other = create_recipe(user=self.user)
+        with tempfile.NamedTemporaryFile(suffix='.JPG') as image_file:
+            with self.recipe.image.open('rb') as stored:
+                image_file.write(stored.read())
+            image_file.seek(0)
+            self.client.post(
+                image_upload_url(other.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        other.refresh_from_db()
+
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertRegex(
+            self.recipe.image.name,
+            r'^uploads/recipe/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}'
+            r'\.jpg$',
+        )
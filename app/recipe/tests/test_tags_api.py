@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -38,6 +39,9 @@ class PrivateTagApiTests(TestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
+    def tearDown(self):
+        cache.clear()
+
     def test_list_tags(self):
         '''Test listing tags is successful.'''
         models.Tag.objects.create(user=self.user, name='Soup')
@@ -65,6 +69,31 @@ class PrivateTagApiTests(TestCase):
         self.assertEqual(res.data[0]['name'], tag.name)
         self.assertEqual(res.data[0]['id'], tag.id)
 
+    def test_list_tags_sparse_fields(self):
+        '''Test listing only the names of tags.'''
+        models.Tag.objects.create(user=self.user, name='Soup')
+
+        res = self.client.get(TAGS_URL, {'fields': 'name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'name': 'Soup'}])
+
+    def test_list_tags_not_modified(self):
+        '''Test unchanged tags are answered with 304 until a tag changes.'''
+        tag = models.Tag.objects.create(user=self.user, name='Soup')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Stew'
+            tag.save()
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_update_tag_success(self):
         '''Test updating a tag.'''
         tag = models.Tag.objects.create(user=self.user, name='Pasta')
@@ -77,6 +106,18 @@ class PrivateTagApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_to_existing_name_error(self):
+        '''Test renaming a tag to a name the user already has fails.'''
+        models.Tag.objects.create(user=self.user, name='Pizza')
+        tag = models.Tag.objects.create(user=self.user, name='Pasta')
+
+        url = create_detail_url(tag.id)
+        res = self.client.patch(url, {'name': 'Pizza'})
+        tag.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(tag.name, 'Pasta')
+
     def test_destroy_tag_success(self):
         '''Test deleting a tag.'''
         tag = models.Tag.objects.create(user=self.user, name='Steak')
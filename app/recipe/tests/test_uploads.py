@@ -0,0 +1,57 @@
+'''
+Tests for streaming image upload validation.
+'''
+from io import BytesIO
+
+from django.core.files.uploadhandler import StopUpload
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from recipe.uploads import ImageUploadHandler, sniff_format
+
+
+def image_bytes(size, image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+class ImageUploadHandlerTests(SimpleTestCase):
+    '''Test the upload handler checks images as chunks arrive.'''
+
+    def _start(self):
+        handler = ImageUploadHandler()
+        handler.new_file('image', 'photo.png', 'image/png', None)
+        return handler
+
+    def test_sniff_format(self):
+        '''Test formats are recognised from their leading bytes.'''
+        self.assertEqual(sniff_format(image_bytes((1, 1))), 'PNG')
+        self.assertEqual(sniff_format(image_bytes((1, 1), 'JPEG')), 'JPEG')
+        self.assertEqual(sniff_format(image_bytes((1, 1), 'WEBP')), 'WEBP')
+        self.assertIsNone(sniff_format(b'%PDF-1.7 ...'))
+
+    @override_settings(IMAGE_UPLOADS={'MAX_PIXELS': 1000})
+    def test_pixel_limit_aborts_on_header(self):
+        '''Test oversized dimensions abort with the first chunk.'''
+        handler = self._start()
+        content = image_bytes((4000, 4000))
+
+        with self.assertRaises(StopUpload) as cm:
+            handler.receive_data_chunk(content[:64], 0)
+
+        self.assertTrue(cm.exception.connection_reset)
+        self.assertIn('pixels', str(handler.error.detail))
+
+    def test_valid_image_is_spooled(self):
+        '''Test a valid image is written to the temporary file.'''
+        handler = self._start()
+        content = image_bytes((20, 20))
+
+        handler.receive_data_chunk(content[:30], 0)
+        handler.receive_data_chunk(content[30:], 30)
+        upload = handler.file_complete(len(content))
+
+        self.assertTrue(handler.identified)
+        self.assertIsNone(handler.error)
+        self.assertEqual(upload.read(), content)
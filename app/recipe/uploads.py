@@ -0,0 +1,169 @@
+'''
+Streaming validation of recipe image uploads.
+
+Uploads are spooled to a temporary file while their size, format and pixel
+dimensions are checked chunk by chunk, so a rejected upload is aborted
+before the rest of the body is read and no upload is held in memory.
+'''
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.http import QueryDict
+from django.http.multipartparser import (
+    MultiPartParser as DjangoMultiPartParser,
+    MultiPartParserError,
+)
+from django.utils.datastructures import MultiValueDict
+from django.utils.translation import gettext as _, gettext_lazy
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+DEFAULTS = {
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'FORMATS': ['JPEG', 'PNG', 'GIF', 'WEBP'],
+}
+
+# Room for the multipart boundaries, headers and small form fields.
+FORM_OVERHEAD = 64 * 1024
+
+# Bytes buffered in memory while waiting for the image size.
+HEADER_LIMIT = 1024 * 1024
+
+SIGNATURES = (
+    ('JPEG', lambda head: head.startswith(b'\xff\xd8\xff')),
+    ('PNG', lambda head: head.startswith(b'\x89PNG\r\n\x1a\n')),
+    ('GIF', lambda head: head[:6] in (b'GIF87a', b'GIF89a')),
+    ('WEBP', lambda head: head[:4] == b'RIFF' and head[8:12] == b'WEBP'),
+)
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = gettext_lazy('Upload is too large.')
+    default_code = 'upload_too_large'
+
+
+def get_upload_settings():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_UPLOADS', {})}
+
+
+def sniff_format(head):
+    '''Return the image format named by the leading bytes, or None.'''
+    for image_format, matches in SIGNATURES:
+        if matches(head):
+            return image_format
+    return None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    '''Spool image uploads to disk, aborting them at the first violation.
+
+    The failure is kept in error for the parser to raise once Django has
+    stopped reading the request.
+    '''
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.options = get_upload_settings()
+        self.error = None
+
+    def _abort(self, error):
+        self.error = error
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length > self.options['MAX_BYTES'] + FORM_OVERHEAD:
+            self.error = UploadTooLarge()
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None, content_type_extra=None):
+        self.received = 0
+        self.head = b''
+        self.identified = False
+        if content_length and content_length > self.options['MAX_BYTES']:
+            self._abort(UploadTooLarge())
+        super().new_file(field_name, file_name, content_type,
+                         content_length, charset, content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.options['MAX_BYTES']:
+            self._abort(UploadTooLarge())
+        if self.head is not None:
+            self._check_header(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def _identify(self, image_file):
+        '''Check the image dimensions, False while the header is partial.
+
+        Image.open only reads the header, no pixels are decoded.
+        '''
+        try:
+            with Image.open(image_file,
+                            formats=self.options['FORMATS']) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self._abort(ParseError(_('Image has too many pixels.')))
+        except (OSError, SyntaxError, ValueError):
+            return False
+
+        if width * height > self.options['MAX_PIXELS']:
+            self._abort(ParseError(_('Image has too many pixels.')))
+        self.identified = True
+        return True
+
+    def _check_header(self, raw_data):
+        '''Check the format and size as soon as the header has arrived.'''
+        sniffed = len(self.head) >= 12
+        self.head += raw_data
+        if not sniffed and len(self.head) >= 12 and (
+            sniff_format(self.head) not in self.options['FORMATS']
+        ):
+            self._abort(ParseError(_('Unsupported image format.')))
+
+        if self._identify(BytesIO(self.head)):
+            self.head = None
+        elif len(self.head) > HEADER_LIMIT:
+            # Some formats only expose their size with the whole file,
+            # those are checked from the spooled file once complete.
+            self.head = None
+
+    def file_complete(self, file_size):
+        if not self.identified:
+            self.file.seek(0)
+            head = self.file.read(12)
+            self.file.seek(0)
+            if (sniff_format(head) not in self.options['FORMATS']
+                    or not self._identify(self.file)):
+                self._abort(ParseError(_('Invalid image.')))
+        return super().file_complete(file_size)
+
+
+class ImageMultiPartParser(MultiPartParser):
+    '''Multipart parser reading uploads through ImageUploadHandler.'''
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        handler = ImageUploadHandler(request._request)
+
+        try:
+            parser = DjangoMultiPartParser(meta, stream, [handler], encoding)
+            data, files = parser.parse()
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
+
+        if handler.error is not None:
+            raise handler.error
+        return DataAndFiles(data, files)
@@ -1,86 +1,228 @@
 '''
 Views for recipe APIs.
 '''
+from collections import Counter
+from itertools import islice
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
     OpenApiParameter,
 )
 from drf_spectacular.types import OpenApiTypes
-from rest_framework import viewsets, mixins, status
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
+from rest_framework import viewsets, mixins, serializers, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import Recipe, Tag, Ingredient
+from core.renderers import FastJSONRenderer
+from core.search import search_recipes
+from user.authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from .filters import filter_assigned, filter_by_related
+from .mixins import CachedListMixin, ConditionalMixin, SparseFieldsMixin
+from .pagination import RecipeCursorPagination
+from .renderers import CSVRenderer, NDJSONRenderer
 from .serializers import (
+    RELATED_FIELDS,
+    RecipeRowSerializer,
     RecipeSerializer,
     RecipeDetailSerializer,
     TagSerializer,
     IngredientSerializer,
-    RecipeImageSerializer
+    RecipeImageSerializer,
+    RecipeBulkDeleteSerializer,
     )
+from .uploads import ImageMultiPartParser
+
+
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        'tags',
+        OpenApiTypes.STR,
+        description='Comma separated list of tag IDs to filter'
+    ),
+    OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma separated list of ingredient IDs to filter'
+    ),
+    OpenApiParameter(
+        'match',
+        OpenApiTypes.STR, enum=['any', 'all'],
+        description='Match recipes with any (default) or all of '
+                    'the given tags and ingredients'
+    ),
+    OpenApiParameter(
+        'search',
+        OpenApiTypes.STR,
+        description='Full-text search, results ordered by rank'
+    ),
+]
+
+SPARSE_FIELD_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields to return'
+    ),
+    OpenApiParameter(
+        'omit',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields not to return'
+    ),
+]
 
 
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                'tags',
-                OpenApiTypes.STR,
-                description='Comma separated list of tag IDs to filter'
-            ),
-            OpenApiParameter(
-                'ingredients',
-                OpenApiTypes.STR,
-                description='Comma separated list of ingredient IDs to filter'
-            )
-        ]
-    )
+        parameters=RECIPE_FILTER_PARAMETERS + SPARSE_FIELD_PARAMETERS
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELD_PARAMETERS),
+    export=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS,
+        responses={
+            (200, NDJSONRenderer.media_type): OpenApiTypes.BINARY,
+            (200, CSVRenderer.media_type): OpenApiTypes.BINARY,
+            (200, FastJSONRenderer.media_type): OpenApiTypes.BINARY,
+        },
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SparseFieldsMixin,
+                    ConditionalMixin,
+                    CachedListMixin,
+                    viewsets.ModelViewSet):
     '''View for managing recipe API's'''
     serializer_class = RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    # Relations each serializer renders, fetched once per page instead of
+    # once per recipe. Only the columns the nested serializers use are read.
+    prefetch_plan = {
+        RecipeSerializer: (
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+            Prefetch('ingredients',
+                     queryset=Ingredient.objects.only('id', 'name')),
+        ),
+        RecipeDetailSerializer: (
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+            Prefetch('ingredients',
+                     queryset=Ingredient.objects.only('id', 'name')),
+        ),
+        RecipeImageSerializer: (),
+    }
+    # Actions reading values() rows, their relations are read by
+    # RecipeRowSerializer.related_rows.
+    row_actions = ('list', 'export')
+    bulk_max_size = 1000
+    # Recipes read per query while exporting, each chunk with its own
+    # query of the relations.
+    export_chunk_size = 2000
+    export_fields = (
+        'id',
+        'title',
+        'time_minute',
+        'price',
+        'link',
+        'description',
+        'tags',
+        'ingredients',
+    )
 
     def _convert_params_to_int(self, qs) -> list:
         '''Convert params to a list of integers'''
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _match_all(self) -> bool:
+        '''Whether related filters must match all of the given ids.'''
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise serializers.ValidationError(
+                {'match': [_('Must be "any" or "all".')]}
+            )
+        return match == 'all'
+
     def get_queryset(self):
         '''Retrieve recipes for authenticated user.'''
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match_all = self._match_all()
         query_set = self.queryset
 
         if tags:
             tag_ids = self._convert_params_to_int(tags)
-            query_set = query_set.filter(tags__id__in=tag_ids)
+            query_set = filter_by_related(
+                query_set, 'tags', tag_ids, match_all
+            )
 
         if ingredients:
             ingredient_ids = self._convert_params_to_int(ingredients)
-            query_set = query_set.filter(ingredients__id__in=ingredient_ids)
+            query_set = filter_by_related(
+                query_set, 'ingredients', ingredient_ids, match_all
+            )
 
-        return query_set.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        query_set = query_set.filter(user=self.request.user)
+        fields = self.get_sparse_fields()
+        if self.action not in self.row_actions:
+            query_set = self.sparse_only(query_set).prefetch_related(*(
+                prefetch
+                for prefetch in self.prefetch_plan.get(
+                    self.get_serializer_class(), ()
+                )
+                if fields is None or prefetch.prefetch_to in fields
+            ))
+        ordering = ['-id']
 
-    def get_serializer_class(self):
+        search = self.request.query_params.get('search')
+        if search:
+            query_set = search_recipes(query_set, search)
+            ordering.insert(0, '-rank')
+
+        query_set = query_set.order_by(*ordering)
         if self.action == 'list':
+            # Annotations, like the search rank, position the cursor.
+            query_set = query_set.values(
+                *RecipeRowSerializer.columns(fields),
+                *query_set.query.annotations,
+            )
+        return query_set
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'export', 'bulk_create', 'bulk_update'):
             return RecipeSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
+        elif self.action == 'bulk_destroy':
+            return RecipeBulkDeleteSerializer
 
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list' and kwargs.get('many'):
+            kwargs.setdefault('context', self.get_serializer_context())
+            return RecipeRowSerializer(
+                *args, fields=self.get_sparse_fields(), **kwargs
+            )
+        return super().get_serializer(*args, **kwargs)
+
     def perform_create(self, serializer):
         '''create a new recipe.'''
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], url_path='upload-image', detail=True)
+    @action(methods=['POST'], url_path='upload-image', detail=True,
+            parser_classes=[ImageMultiPartParser])
     def upload_image(self, request, pk=None):
         '''Upload an image to the recipe.'''
         recipe = self.get_object()
@@ -92,6 +234,127 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _export_rows(self, rows):
+        '''Yield the exported fields of recipe rows, relations by name.'''
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.export_chunk_size)):
+            ids = [row['id'] for row in chunk]
+            related = {
+                field: RecipeRowSerializer.related_rows(field, ids)
+                for field in RELATED_FIELDS
+            }
+            for row in chunk:
+                row['price'] = str(row['price'])
+                for field in RELATED_FIELDS:
+                    row[field] = [
+                        item['name']
+                        for item in related[field].get(row['id'], ())
+                    ]
+                yield row
+
+    @action(methods=['GET'], detail=False, renderer_classes=[
+        NDJSONRenderer, CSVRenderer, FastJSONRenderer,
+    ])
+    def export(self, request):
+        '''Stream the user's recipes as NDJSON, CSV or a JSON array.'''
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        rows = self.get_queryset().values(*(
+            field for field in self.export_fields
+            if field not in RELATED_FIELDS
+        )).iterator(chunk_size=self.export_chunk_size)
+        response = StreamingHttpResponse(
+            renderer.stream(self._export_rows(rows), self.export_fields),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{renderer.format}"'
+        )
+        return response
+
+    def _bulk_response(self, recipes, status_code):
+        '''Return the bulk processed recipes in payload order.'''
+        found = Recipe.objects.prefetch_related(
+            *self.prefetch_plan[RecipeSerializer]
+        ).in_bulk([recipe.id for recipe in recipes])
+        serializer = RecipeSerializer(
+            [found[recipe.id] for recipe in recipes],
+            many=True,
+        )
+
+        return Response(serializer.data, status=status_code)
+
+    @action(methods=['POST'], url_path='bulk', detail=False)
+    def bulk_create(self, request):
+        '''Create a list of recipes in one transaction.'''
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            max_length=self.bulk_max_size,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            recipes = serializer.save(user=self.request.user)
+
+        return self._bulk_response(recipes, status.HTTP_201_CREATED)
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        '''Partially update a list of recipes, each item naming its id.'''
+        items = request.data if isinstance(request.data, list) else []
+        ids = [item.get('id') if isinstance(item, dict) else None
+               for item in items]
+        counts = Counter(ids)
+        found = Recipe.objects.filter(user=self.request.user).in_bulk(
+            [i for i in counts if isinstance(i, int)]
+        )
+        errors = [
+            {} if recipe_id in found and counts[recipe_id] == 1
+            else {'id': [_('A unique id of your recipes is required.')]}
+            for recipe_id in ids
+        ]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(
+            [found[recipe_id] for recipe_id in ids],
+            data=request.data,
+            many=True,
+            partial=True,
+            max_length=self.bulk_max_size,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            recipes = serializer.save()
+
+        return self._bulk_response(recipes, status.HTTP_200_OK)
+
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        '''Delete a list of recipes by id in one transaction.'''
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        recipes = Recipe.objects.filter(user=self.request.user, id__in=ids)
+
+        with transaction.atomic():
+            missing = set(ids) - set(recipes.values_list('id', flat=True))
+            if missing:
+                msg = _('Recipes not found: {ids}.').format(
+                    ids=', '.join(str(i) for i in sorted(missing))
+                )
+                return Response(
+                    {'ids': [msg]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            recipes.delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -100,17 +363,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.'
-            )
+            ),
+            *SPARSE_FIELD_PARAMETERS,
         ]
     )
 )
-class BaseViewSet(mixins.ListModelMixin,
+class BaseViewSet(SparseFieldsMixin,
+                  ConditionalMixin,
+                  CachedListMixin,
+                  mixins.ListModelMixin,
                   mixins.UpdateModelMixin,
                   mixins.DestroyModelMixin,
                   viewsets.GenericViewSet):
     '''Base ViewSet for Tag and ingredient ViewSets.'''
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
 
     def get_queryset(self):
         user = self.request.user
@@ -120,18 +390,31 @@ class BaseViewSet(mixins.ListModelMixin,
         query_set = self.queryset
 
         if assigned_only:
-            query_set = query_set.filter(recipe__isnull=False)
+            query_set = filter_assigned(query_set, self.recipe_relation)
+
+        return self.sparse_only(
+            query_set.filter(user=user).order_by('-name')
+        )
 
-        return query_set.filter(user=user).order_by('-name').distinct()
+    def perform_update(self, serializer):
+        '''Update the object, rejecting names the user already has.'''
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            msg = _('An item with this name already exists.')
+            raise serializers.ValidationError({'name': [msg]})
 
 
 class TagViewSet(BaseViewSet):
     '''Manage tags in the database.'''
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
+    recipe_relation = 'tags'
 
 
 class IngredientViewSet(BaseViewSet):
     '''Manage Ingredients in database.'''
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
+    recipe_relation = 'ingredients'
@@ -0,0 +1,181 @@
+'''
+Authentication for the APIs.
+'''
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from .tokens import ACCESS, get_signed_token_settings, read_token, token_user
+
+DEFAULTS = {
+    'MAX_SIZE': 4096,
+    'TTL': 60,
+    'SHARED_CACHE': None,
+}
+
+
+class TTLCache:
+    '''Thread safe, size bounded LRU cache with expiring entries.'''
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''Return the value for key, or None if missing or expired.'''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        '''Store value for key, evicting the least recently used entry.'''
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        '''Remove key from the cache.'''
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        '''Remove every entry.'''
+        with self._lock:
+            self._data.clear()
+
+
+def get_cache_settings():
+    '''Return the token cache settings merged over the defaults.'''
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+_local_cache = None
+_local_cache_lock = threading.Lock()
+
+
+def get_local_cache():
+    '''Return this worker's token cache, creating it on first use.'''
+    global _local_cache
+    if _local_cache is None:
+        with _local_cache_lock:
+            if _local_cache is None:
+                config = get_cache_settings()
+                _local_cache = TTLCache(config['MAX_SIZE'], config['TTL'])
+    return _local_cache
+
+
+def get_shared_cache():
+    '''Return the optional cache shared by all workers.'''
+    alias = get_cache_settings()['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    return f'auth-token:{key}'
+
+
+def invalidate_tokens(*keys):
+    '''Drop cached authentication results for the token keys.
+
+    They are dropped once the transaction commits, so a concurrent request
+    can't cache the rows as they were before. Only the shared cache reaches
+    every worker, the local ones are used without it.
+    '''
+    if keys:
+        transaction.on_commit(lambda: _invalidate(keys))
+
+
+def _invalidate(keys):
+    local_cache = get_local_cache()
+    for key in keys:
+        local_cache.delete(key)
+
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete_many([_shared_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''Token authentication that caches the token and user lookup.
+
+    Results are kept for the TTL in the shared Django cache when one is
+    configured, so warm requests don't hit the database and invalidations
+    reach every worker. Without it they are kept in a per worker LRU, which
+    only suits a single process.
+    '''
+    def authenticate_credentials(self, key):
+        shared_cache = get_shared_cache()
+        if shared_cache is None:
+            local_cache = get_local_cache()
+            result = local_cache.get(key)
+            if result is None:
+                result = super().authenticate_credentials(key)
+                local_cache.set(key, result)
+        else:
+            result = shared_cache.get(_shared_key(key))
+            if result is None:
+                result = super().authenticate_credentials(key)
+                config = get_cache_settings()
+                shared_cache.set(_shared_key(key), result, config['TTL'])
+
+        # Each request gets its own copies so views can't leak state
+        # into the cached objects.
+        user, token = result
+        token = copy.copy(token)
+        token.user = copy.copy(user)
+        return (token.user, token)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    '''Authentication with signed access tokens from user.tokens.
+
+    Clients send `Authorization: Bearer <access token>`. Verification only
+    checks the signature, expiry and the revocation list, so it needs no
+    database access. Does nothing unless SIGNED_TOKENS is enabled.
+    '''
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        if not get_signed_token_settings()['ENABLED']:
+            return None
+
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            msg = _('Invalid token header.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            claims = read_token(auth[1].decode(), ACCESS)
+        except (UnicodeError, signing.BadSignature):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        return (token_user(claims), claims)
+
+    def authenticate_header(self, request):
+        return self.keyword
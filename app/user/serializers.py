@@ -3,9 +3,12 @@ Serializers for user API view.
 '''
 
 from django.contrib.auth import get_user_model, authenticate
+from django.core import signing
 from django.utils.translation import gettext as _
 from rest_framework import serializers
 
+from .tokens import REFRESH, password_unchanged, read_token
+
 
 class UserSerializer(serializers.ModelSerializer):
     '''Serializer for user object.'''
@@ -21,15 +24,22 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
-        '''Update and return user with encrypted password.'''
+        '''Update and return user with encrypted password.
+
+        Only the given fields are written, the rest of the row is kept.
+        '''
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        fields = list(validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
 
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            fields.append('password')
+        if fields:
+            instance.save(update_fields=fields)
 
-        return user
+        return instance
 
 
 class TokenAuthSerializer(serializers.Serializer):
@@ -59,3 +69,30 @@ class TokenAuthSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    '''Serializer for a signed refresh token.'''
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        '''Validate the refresh token and load its active user.'''
+        try:
+            claims = read_token(attrs['refresh'], REFRESH)
+        except signing.BadSignature:
+            msg = _('Invalid or expired refresh token.')
+            raise serializers.ValidationError(msg, code='authorization')
+
+        user = get_user_model().objects.filter(
+            pk=claims['uid'], is_active=True
+        ).first()
+        if user is None:
+            msg = _('User inactive or deleted.')
+            raise serializers.ValidationError(msg, code='authorization')
+        if not password_unchanged(claims, user):
+            msg = _('Password changed since the token was issued.')
+            raise serializers.ValidationError(msg, code='authorization')
+
+        attrs['claims'] = claims
+        attrs['user'] = user
+        return attrs
@@ -0,0 +1,29 @@
+'''
+Signal handlers for the user app.
+'''
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    '''Stop accepting a deleted token from the cache.'''
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    '''Drop cached tokens when a user changes.
+
+    Saving the user may change `is_active` or the password, and the cached
+    user object would be stale for any other change too.
+    '''
+    if created:
+        return
+    invalidate_tokens(
+        *Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
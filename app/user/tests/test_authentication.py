@@ -0,0 +1,153 @@
+'''
+Tests for the cached token authentication.
+'''
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from user.authentication import TTLCache, get_local_cache
+
+ME_URL = reverse('user:me')
+
+
+class TTLCacheTests(SimpleTestCase):
+    '''Test the bounded LRU cache.'''
+    def test_evicts_least_recently_used(self):
+        '''Test the oldest unused entry is evicted when full.'''
+        ttl_cache = TTLCache(max_size=2, ttl=60)
+        ttl_cache.set('a', 1)
+        ttl_cache.set('b', 2)
+        ttl_cache.get('a')
+        ttl_cache.set('c', 3)
+
+        self.assertEqual(ttl_cache.get('a'), 1)
+        self.assertIsNone(ttl_cache.get('b'))
+        self.assertEqual(ttl_cache.get('c'), 3)
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        '''Test entries are dropped once their TTL has passed.'''
+        patched_monotonic.return_value = 100
+        ttl_cache = TTLCache(max_size=2, ttl=60)
+        ttl_cache.set('a', 1)
+
+        patched_monotonic.return_value = 161
+
+        self.assertIsNone(ttl_cache.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    '''Test authenticating requests with cached tokens.'''
+    def setUp(self):
+        get_local_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        get_local_cache().clear()
+        cache.clear()
+
+    def test_warm_request_skips_database(self):
+        '''Test a repeated request authenticates without queries.'''
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        '''Test a deleted token is no longer accepted from the cache.'''
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        '''Test a deactivated user's cached token is invalidated.'''
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        '''Test changing the password drops the cached token.'''
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('newpass123')
+            self.user.save()
+
+        self.assertIsNone(cache.get(f'auth-token:{self.token.key}'))
+
+    def test_invalidated_on_commit(self):
+        '''Test a cached token is dropped only once the change commits.'''
+        self.client.get(ME_URL)
+        key = f'auth-token:{self.token.key}'
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.token.delete()
+            self.assertIsNotNone(cache.get(key))
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(key))
+
+    def test_update_starts_from_stored_user(self):
+        '''Test an update doesn't write back a stale cached user.'''
+        self.client.get(ME_URL)
+        # Changed by another worker, this worker's cache isn't invalidated.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password('newpass123')
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Renamed')
+        self.assertTrue(self.user.check_password('newpass123'))
+
+    def test_shared_cache_skips_local_tier(self):
+        '''Test workers share cached tokens, so invalidations reach all.'''
+        self.client.get(ME_URL)
+
+        self.assertIsNone(get_local_cache().get(self.token.key))
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': None})
+    def test_local_cache_without_shared_cache(self):
+        '''Test a single process caches tokens in its local LRU.'''
+        self.client.get(ME_URL)
+
+        self.assertIsNotNone(get_local_cache().get(self.token.key))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
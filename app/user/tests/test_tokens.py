@@ -0,0 +1,148 @@
+'''
+Tests for signed access tokens.
+'''
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+TOKEN_AUTH_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(SIGNED_TOKENS={'ENABLED': True})
+class SignedTokenApiTests(TestCase):
+    '''Test the signed token flow.'''
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test User',
+        )
+        self.client = APIClient()
+        res = self.client.post(TOKEN_AUTH_URL, {
+            'email': 'test@example.com',
+            'password': 'testpass123',
+        })
+        self.tokens = res.data
+
+    def tearDown(self):
+        cache.clear()
+
+    def _authenticate(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_create_signed_tokens(self):
+        '''Test the token endpoint issues access and refresh tokens.'''
+        self.assertIn('access', self.tokens)
+        self.assertIn('refresh', self.tokens)
+        self.assertNotIn('token', self.tokens)
+
+    def test_authenticate_without_database(self):
+        '''Test an access token authenticates without a query.'''
+        self._authenticate(self.tokens['access'])
+
+        with self.assertNumQueries(1):  # Only the recipe page.
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_profile_with_signed_token(self):
+        '''Test the profile is loaded for a signed token.'''
+        self._authenticate(self.tokens['access'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_tampered_token_rejected(self):
+        '''Test a modified token is rejected.'''
+        self._authenticate(self.tokens['access'][:-1] + 'x')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_rejected(self):
+        '''Test an access token is rejected after its TTL.'''
+        self._authenticate(self.tokens['access'])
+
+        with patch('django.core.signing.time.time', return_value=2 ** 40):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_tokens(self):
+        '''Test a refresh token is exchanged once for new tokens.'''
+        res = self.client.post(REFRESH_URL, {
+            'refresh': self.tokens['refresh']
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('access', res.data)
+
+        res = self.client.post(REFRESH_URL, {
+            'refresh': self.tokens['refresh']
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_refresh_succeeds_once(self):
+        '''Test refreshes racing past the revocation check can't both win.'''
+        with patch('user.tokens.is_revoked', return_value=False):
+            first = self.client.post(REFRESH_URL, {
+                'refresh': self.tokens['refresh']
+            })
+            second = self.client.post(REFRESH_URL, {
+                'refresh': self.tokens['refresh']
+            })
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_after_password_change_error(self):
+        '''Test a password change ends the refresh tokens issued before.'''
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL, {
+            'refresh': self.tokens['refresh']
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refresh_inactive_user_error(self):
+        '''Test a deactivated user can't refresh tokens.'''
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL, {
+            'refresh': self.tokens['refresh']
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_tokens(self):
+        '''Test revoked access and refresh tokens are rejected.'''
+        self._authenticate(self.tokens['access'])
+
+        res = self.client.post(REVOKE_URL, {
+            'refresh': self.tokens['refresh']
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(REFRESH_URL, {
+            'refresh': self.tokens['refresh']
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
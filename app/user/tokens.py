@@ -0,0 +1,121 @@
+'''
+Signed, expiring access and refresh tokens.
+
+Tokens are HMAC signed with SECRET_KEY and carry the claims needed to
+authenticate a request, so verifying them needs no database access. A
+small revocation list in the cache handles logout.
+
+Refresh tokens also carry an HMAC of the user's password hash, checked
+against the database on refresh, so changing the password ends them.
+'''
+import secrets
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+DEFAULTS = {
+    'ENABLED': False,
+    'ACCESS_TTL': 300,
+    'REFRESH_TTL': 7 * 24 * 3600,
+    'REVOCATION_CACHE': 'default',
+}
+
+
+def get_signed_token_settings():
+    '''Return the signed token settings merged over the defaults.'''
+    return {**DEFAULTS, **getattr(settings, 'SIGNED_TOKENS', {})}
+
+
+def _ttl(kind):
+    return get_signed_token_settings()[f'{kind.upper()}_TTL']
+
+
+def _salt(kind):
+    return f'user.tokens.{kind}'
+
+
+def _password_claim(user):
+    return salted_hmac(_salt('password'), user.password).hexdigest()
+
+
+def issue_tokens(user):
+    '''Create and return an access and a refresh token for the user.'''
+    claims = {'uid': user.pk, 'email': user.email, 'name': user.name}
+    extra = {ACCESS: {}, REFRESH: {'pwd': _password_claim(user)}}
+
+    return {
+        kind: signing.dumps(
+            {
+                **claims,
+                **extra[kind],
+                'jti': secrets.token_urlsafe(12),
+                'iat': time.time(),
+            },
+            salt=_salt(kind),
+        )
+        for kind in (ACCESS, REFRESH)
+    }
+
+
+def password_unchanged(claims, user):
+    '''Return whether the user's password is the one the token was for.'''
+    return constant_time_compare(
+        claims.get('pwd', ''), _password_claim(user)
+    )
+
+
+def read_token(value, kind):
+    '''Verify a token of the given kind and return its claims.
+
+    Raises signing.BadSignature, or its SignatureExpired subclass, when the
+    token is invalid, expired or revoked.
+    '''
+    claims = signing.loads(value, salt=_salt(kind), max_age=_ttl(kind))
+    if is_revoked(claims):
+        raise signing.BadSignature('Token has been revoked.')
+
+    return claims
+
+
+def _revocation_key(claims):
+    return f'revoked-token:{claims["jti"]}'
+
+
+def revoke(claims, kind):
+    '''Revoke a token until it would have expired anyway.
+
+    Returns whether this call revoked it. The cache adds the key
+    atomically, so of concurrent calls for a token only one gets True.
+    '''
+    remaining = claims['iat'] + _ttl(kind) - time.time()
+    if remaining <= 0:
+        return False
+    cache = caches[get_signed_token_settings()['REVOCATION_CACHE']]
+    return cache.add(_revocation_key(claims), True, int(remaining) + 1)
+
+
+def is_revoked(claims):
+    '''Return whether the token with these claims was revoked.'''
+    cache = caches[get_signed_token_settings()['REVOCATION_CACHE']]
+    return cache.get(_revocation_key(claims), False)
+
+
+def token_user(claims):
+    '''Build the user described by access token claims without a query.
+
+    The instance only carries what the token holds; load the user from the
+    database before changing or saving it.
+    '''
+    return get_user_model()(
+        pk=claims['uid'],
+        email=claims['email'],
+        name=claims['name'],
+        is_active=True,
+    )
@@ -1,11 +1,31 @@
 '''
 Views for the user API.
 '''
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.translation import gettext as _
+from rest_framework import generics, permissions, serializers, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
-from .serializers import UserSerializer, TokenAuthSerializer
+from .authentication import (
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from .serializers import (
+    UserSerializer,
+    TokenAuthSerializer,
+    RefreshTokenSerializer,
+)
+from .tokens import (
+    ACCESS,
+    REFRESH,
+    get_signed_token_settings,
+    issue_tokens,
+    read_token,
+    revoke,
+)
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -14,17 +34,82 @@ class CreateUserView(generics.CreateAPIView):
 
 
 class CreateTokenView(ObtainAuthToken):
-    '''View to create auth token for a user.'''
+    '''View to create auth token for a user.
+
+    Returns signed access and refresh tokens instead of a database token
+    when SIGNED_TOKENS is enabled.
+    '''
     serializer_class = TokenAuthSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES  # Browsable Api
 
+    def post(self, request, *args, **kwargs):
+        if not get_signed_token_settings()['ENABLED']:
+            return super().post(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(issue_tokens(serializer.validated_data['user']))
+
+
+class RefreshTokenView(generics.GenericAPIView):
+    '''View to exchange a refresh token for a new pair of tokens.
+
+    The token is revoked as it's exchanged, a concurrent request that
+    already revoked it wins and this one is refused.
+    '''
+    serializer_class = RefreshTokenSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not revoke(serializer.validated_data['claims'], REFRESH):
+            msg = _('Invalid or expired refresh token.')
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [msg]},
+                code='authorization',
+            )
+
+        return Response(issue_tokens(serializer.validated_data['user']))
+
+
+class RevokeTokenView(generics.GenericAPIView):
+    '''View to revoke the current access token and a refresh token.'''
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        revoke(request.auth, ACCESS)
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                revoke(read_token(refresh, REFRESH), REFRESH)
+            except signing.BadSignature:
+                pass
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     '''Manage the authenticated user.'''
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        SignedTokenAuthentication,
+    ]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        '''Retrieve and return the authenticated user.'''
-        return self.request.user
+        '''Retrieve and return the authenticated user.
+
+        Signed tokens only carry a few claims, and cached token users may
+        be up to TOKEN_AUTH_CACHE TTL old, other workers' changes included.
+        Both are loaded from the database, cached users only for writes.
+        '''
+        signed = isinstance(
+            self.request.successful_authenticator, SignedTokenAuthentication
+        )
+        if self.request.method in permissions.SAFE_METHODS and not signed:
+            return self.request.user
+        return get_user_model().objects.get(pk=self.request.user.pk)